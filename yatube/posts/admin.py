@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 from posts.models import Comment, Follow, Group, Post
+from posts.search import match_query, matching_ids_sql
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,6 +17,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Текст ищем по FTS5 вместо icontains по всей таблице.
+        match = match_query(search_term)
+        if match is None:
+            return queryset, False
+        return queryset.filter(id__in=RawSQL(*matching_ids_sql(match))), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,56 @@
+"""Ссылки постов на файлы картинок.
+
+Одинаковые картинки хранятся одним файлом (posts.storage), поэтому файл
+и его миниатюры удаляются, только когда на него не ссылается ни один
+пост. Счётчики ведут сигналы, пересчитывает команда recount.
+"""
+import logging
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import F
+from posts.models import ImageBlob, Post
+from posts.storage import post_images
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name):
+    if not name:
+        return
+    blobs = ImageBlob.objects.filter(name=name)
+    if not blobs.update(refs=F('refs') + 1):
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name)], ignore_conflicts=True
+        )
+        blobs.update(refs=F('refs') + 1)
+
+
+def release(name):
+    """Снимает ссылку; последний владелец удаляет файл после коммита."""
+    if not name:
+        return
+    blobs = ImageBlob.objects.filter(name=name)
+    blobs.filter(refs__gte=1).update(refs=F('refs') - 1)
+    deleted, _ = blobs.filter(refs=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: discard(name))
+
+
+def discard(name):
+    """Удаляет файл и его миниатюры, если ссылок так и не появилось.
+
+    Между release() и коммитом тот же файл мог снова загрузить другой
+    пост, поэтому ссылки проверяются ещё раз.
+    """
+    if (ImageBlob.objects.filter(name=name).exists()
+            or Post.objects.filter(image=name).exists()):
+        return
+    try:
+        default.kvstore.delete(ImageFile(name, post_images))
+        post_images.delete(name)
+    except (SuspiciousFileOperation, OSError):
+        # запись уже закоммичена: файл останется сборщику мусора
+        logger.exception('Не удалось удалить картинку %s', name)
@@ -0,0 +1,56 @@
+"""Готовый HTML карточек постов, общий для всех лент.
+
+Ключ карточки включает свои версии поста, автора и группы (card:post:,
+card:user:, card:group:). Их поднимают только правка поста, нарезка его
+миниатюр и сохранение пользователя или группы — новые посты и подписки
+карточки не трогают. Страница ленты читает свои карточки одним
+get_many и рендерит только промахи; миниатюры из KV тоже разрешаются
+только для них.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from posts import thumbnails, versions
+from posts.replicas import cache_timeout
+
+TEMPLATE = 'includes/post_card.html'
+
+
+def card_names(post):
+    names = [f'card:post:{post.id}', f'card:user:{post.author_id}']
+    if post.group_id is not None:
+        names.append(f'card:group:{post.group_id}')
+    return names
+
+
+def card_key(post, group_link, known):
+    state = repr([known[name] for name in card_names(post)])
+    digest = hashlib.md5(state.encode()).hexdigest()
+    return f'card:html:{post.id}:{int(group_link)}:{digest}'
+
+
+def render_cards(posts, group_link=True):
+    """HTML карточек в порядке постов; group_link — ссылка на группу."""
+    posts = list(posts)
+    known = versions.get_versions(
+        {name for post in posts for name in card_names(post)}
+    )
+    keys = [card_key(post, group_link, known) for post in posts]
+    found = cache.get_many(keys)
+    missing = [post for post, key in zip(posts, keys) if key not in found]
+    if missing:
+        thumbnails.resolve_cards(missing)
+        rendered = {
+            card_key(post, group_link, known): render_to_string(
+                TEMPLATE, {'post': post, 'group_link': group_link}
+            )
+            for post in missing
+        }
+        cache.set_many(
+            rendered, cache_timeout(settings.POST_CARD_CACHE_TIMEOUT)
+        )
+        found.update(rendered)
+    return [mark_safe(found[key]) for key in keys]
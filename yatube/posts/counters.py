@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from posts.models import AuthorStats, Comment, Follow, ImageBlob, Post, User
+from posts.replicas import cache_timeout
+
+
+def change_author(user_id, **deltas):
+    """Сдвигает счётчики автора на deltas, например posts_count=1."""
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    for name, delta in deltas.items():
+        if delta < 0:
+            # не уводим счётчик в минус при рассинхронизации
+            stats = stats.filter(**{f'{name}__gte': -delta})
+    updated = stats.update(
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+    # Строки нет только у пользователей, созданных в обход сигналов:
+    # пересчитываем их целиком. При удалениях строку не создаём —
+    # пользователь мог удаляться каскадом вместе со счётчиками.
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        recount_authors([user_id])
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(id=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def feed_count(name, queryset):
+    """Число записей ленты name без COUNT(*) на каждый просмотр.
+
+    Число пересчитывается не чаще раза в FEED_COUNT_TIMEOUT и может на
+    столько же отставать: версия ленты в ключ не входит, иначе каждый
+    новый пост на сайте заново считал бы главную.
+    """
+    key = f'count:{name}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, cache_timeout(settings.FEED_COUNT_TIMEOUT))
+    return count
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def recount_authors(user_ids=None):
+    """Пересчитывает счётчики авторов по данным таблиц."""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id)
+         for user_id in users.values_list('id', flat=True).iterator()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    stats = AuthorStats.objects.all()
+    if user_ids is not None:
+        stats = stats.filter(user_id__in=user_ids)
+    return stats.update(
+        posts_count=_count(Post.objects, 'author'),
+        followers_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
+
+
+def recount_comments(post_ids=None):
+    """Пересчитывает Post.comments_count по таблице комментариев."""
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(id__in=post_ids)
+    return posts.update(comments_count=_count(Comment.objects, 'post'))
+
+
+def recount_images():
+    """Пересчитывает ссылки на файлы картинок; пустые записи удаляет.
+
+    Сами файлы без ссылок остаются на диске до сборщика мусора.
+    """
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct()
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name) for name in names.iterator()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    updated = ImageBlob.objects.update(refs=_count(Post.objects, 'image'))
+    ImageBlob.objects.filter(refs=0).delete()
+    return updated
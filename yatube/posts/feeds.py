@@ -0,0 +1,169 @@
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Subquery
+from posts import graph, metrics
+from posts.models import Post
+from posts.pagination import KeysetQuerySet
+from posts.replicas import cache_timeout
+from posts.timeline import pulled_authors, timeline_posts
+
+METRICS = (
+    'feed.fanout_threshold',
+    'feed.pull_cutoff',
+    'feed.fanout.posts',
+    'feed.fanout.rows',
+    'feed.fanout.skipped',
+    'feed.pull.requests',
+    'feed.pull.authors',
+)
+
+
+def author_recent_posts(author_id):
+    """Последние FEED_PULL_CUTOFF постов автора для слияния в ленту."""
+    recent = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values('id')[:settings.FEED_PULL_CUTOFF]
+    return Post.objects.select_related('author', 'group').filter(
+        id__in=Subquery(recent)
+    )
+
+
+class MergedFeed:
+    """Слияние нескольких отсортированных лент через heapq.merge.
+
+    Каждый поток отдаёт не больше limit постов после курсора, поэтому
+    страница стоит по одному индексному запросу на поток.
+    """
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    def key(self, post):
+        return post.pub_date, post.id
+
+    def fetch(self, cursor, backwards, limit):
+        merged = heapq.merge(
+            *(stream.fetch(cursor, backwards, limit)
+              for stream in self.streams),
+            key=self.key,
+            reverse=True,
+        )
+        rows, seen = [], set()
+        for post in merged:
+            if post.id not in seen:
+                seen.add(post.id)
+                rows.append(post)
+        return rows[-limit:] if backwards else rows[:limit]
+
+
+def ring_key(author_id):
+    return f'feed:ring:{author_id}'
+
+
+def _load_ring(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('pub_date', 'id')[:settings.FEED_RING_SIZE]
+    )
+
+
+def load_rings(author_ids):
+    """Кольцевые буферы (pub_date, id) последних постов авторов.
+
+    Читаются одним get_many; промахи добираются из базы и кладутся
+    обратно одним set_many.
+    """
+    keys = {ring_key(author_id): author_id for author_id in author_ids}
+    rings = {
+        keys[key]: ring for key, ring in cache.get_many(keys).items()
+    }
+    missing = {
+        ring_key(author_id): _load_ring(author_id)
+        for author_id in keys.values() if author_id not in rings
+    }
+    if missing:
+        cache.set_many(missing, cache_timeout(settings.FEED_RING_TIMEOUT))
+        rings.update(
+            (keys[key], ring) for key, ring in missing.items()
+        )
+    return rings
+
+
+def ring_push(post):
+    """Кладёт новый или изменённый пост в буфер его автора."""
+    key = ring_key(post.author_id)
+    ring = cache.get(key)
+    if ring is None:
+        # буфер соберётся из базы при следующем чтении
+        return
+    entry = (post.pub_date, post.id)
+    if entry not in ring:
+        ring = sorted(ring + [entry], reverse=True)
+        cache.set(
+            key, ring[:settings.FEED_RING_SIZE], settings.FEED_RING_TIMEOUT
+        )
+
+
+def ring_remove(post):
+    key = ring_key(post.author_id)
+    ring = cache.get(key)
+    if ring is not None and (post.pub_date, post.id) in ring:
+        # удалённый пост мог вытеснить из буфера более старый
+        cache.delete(key)
+
+
+class RingFeed:
+    """Лента подписок из кольцевых буферов авторов в кэше.
+
+    Глубина ленты ограничена FEED_RING_SIZE постами на автора.
+    """
+
+    def __init__(self, author_ids):
+        self.author_ids = list(author_ids)
+
+    def key(self, post):
+        return post.pub_date, post.id
+
+    def fetch(self, cursor, backwards, limit):
+        rings = load_rings(self.author_ids).values()
+        if cursor is not None:
+            if backwards:
+                rings = [
+                    [entry for entry in ring if entry > cursor]
+                    for ring in rings
+                ]
+            else:
+                rings = [
+                    [entry for entry in ring if entry < cursor]
+                    for ring in rings
+                ]
+        entries = list(heapq.merge(*rings, reverse=True))
+        entries = entries[-limit:] if backwards else entries[:limit]
+        ids = [post_id for _, post_id in entries]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def follow_feed(user):
+    """Источник ленты подписок согласно FOLLOW_FEED_ENGINE."""
+    engine = settings.FOLLOW_FEED_ENGINE
+    if engine == 'query':
+        return Post.objects.select_related('author', 'group').filter(
+            author__following__user=user
+        )
+    author_ids = sorted(graph.following_ids(user.id))
+    if engine == 'ring':
+        return RingFeed(author_ids)
+    pushed = KeysetQuerySet(timeline_posts(user), ('feed_date', 'feed_post'))
+    pulled = pulled_authors(author_ids) if author_ids else set()
+    if not pulled:
+        return pushed
+    metrics.incr('feed.pull.requests')
+    metrics.incr('feed.pull.authors', len(pulled))
+    return MergedFeed([pushed] + [
+        KeysetQuerySet(author_recent_posts(author_id))
+        for author_id in pulled
+    ])
@@ -0,0 +1,59 @@
+"""Запись подписок: одна вставка или одно удаление на действие.
+
+follow() вставляет строку с игнорированием конфликта по unique_follow,
+unfollow() удаляет её одним DELETE. Оба сигналов не шлют и сами
+обновляют счётчики, ленту, версии страниц и кэш подписок — только если
+строка действительно появилась или исчезла. Подписки через ORM (админка,
+Follow.objects.create) обслуживают те же followed()/unfollowed() из
+сигналов.
+"""
+from django.db import connections, router
+from django.db.models import sql
+from posts import counters, graph, timeline, versions
+from posts.models import Follow
+
+
+def followed(user_id, author_id):
+    counters.change_author(user_id, following_count=1)
+    counters.change_author(author_id, followers_count=1)
+    timeline.mark_pulled([author_id])
+    timeline.backfill(user_id, author_id)
+    graph.invalidate(user_id)
+    versions.bump(f'author:{user_id}', f'author:{author_id}')
+
+
+def unfollowed(user_id, author_id):
+    counters.change_author(user_id, following_count=-1)
+    counters.change_author(author_id, followers_count=-1)
+    timeline.prune(user_id, author_id)
+    graph.invalidate(user_id)
+    versions.bump(f'author:{user_id}', f'author:{author_id}')
+
+
+def follow(user_id, author_id):
+    """Подписывает; повторный вызов ничего не делает. True — если создана."""
+    if user_id == author_id:
+        return False
+    using = router.db_for_write(Follow)
+    query = sql.InsertQuery(Follow, ignore_conflicts=True)
+    query.insert_values(
+        [Follow._meta.get_field('user'), Follow._meta.get_field('author')],
+        [Follow(user_id=user_id, author_id=author_id)],
+    )
+    with connections[using].cursor() as cursor:
+        for statement, params in query.get_compiler(using).as_sql():
+            cursor.execute(statement, params)
+        created = cursor.rowcount > 0
+    if created:
+        followed(user_id, author_id)
+    return created
+
+
+def unfollow(user_id, author_id):
+    """Отписывает одним DELETE. True — если подписка была."""
+    deleted = Follow.objects.filter(
+        user_id=user_id, author_id=author_id
+    )._raw_delete(router.db_for_write(Follow))
+    if deleted:
+        unfollowed(user_id, author_id)
+    return bool(deleted)
@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
+from posts import uploads
 from posts.models import Comment, Post
+from posts.thumbnails import fill_image_meta
 
 
 class PostForm(ModelForm):
@@ -15,6 +20,32 @@ class PostForm(ModelForm):
         }
         fields = ['text', 'group', 'image']
 
+    def __init__(self, *args, rejected_uploads=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rejected_uploads = rejected_uploads
+        self.image_meta = None
+
+    def clean_image(self):
+        if 'image' in self.rejected_uploads:
+            limit = settings.POST_IMAGE_MAX_BYTES // 2 ** 20
+            raise ValidationError(f'Картинка больше {limit} МБ')
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            try:
+                image, *self.image_meta = uploads.process(image)
+            except uploads.ImageRejected as error:
+                raise ValidationError(str(error))
+        return image
+
+    def save(self, commit=True):
+        # размеры и заглушку считаем один раз, пока файл под рукой
+        if self.image_meta is not None:
+            (self.instance.image_width, self.instance.image_height,
+             self.instance.image_placeholder) = self.image_meta
+        elif 'image' in self.changed_data:
+            fill_image_meta(self.instance)
+        return super().save(commit)
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,51 @@
+"""Кэш подписок пользователя: множество id авторов, на которых он подписан.
+
+Множество читается из базы один раз и хранится в кэше компактным
+массивом; сигналы Follow сбрасывают его при подписке и отписке, так
+что проверка «подписан ли» на странице профиля обходится без запросов.
+Счётчики подписчиков и подписок лежат в AuthorStats.
+"""
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from posts.models import Follow
+from posts.replicas import cache_timeout
+
+PREFIX = 'follow:graph:'
+
+
+def graph_key(user_id):
+    return f'{PREFIX}{user_id}'
+
+
+def following_ids(user_id):
+    """frozenset id авторов, на которых подписан пользователь."""
+    key = graph_key(user_id)
+    packed = cache.get(key)
+    if packed is None:
+        ids = Follow.objects.filter(user_id=user_id).order_by(
+            'author_id'
+        ).values_list('author_id', flat=True)
+        packed = array('q', ids).tobytes()
+        cache.set(
+            key, packed, cache_timeout(settings.FOLLOW_GRAPH_TIMEOUT)
+        )
+    ids = array('q')
+    ids.frombytes(packed)
+    return frozenset(ids)
+
+
+def is_following(user, author):
+    if not user.is_authenticated:
+        return False
+    return author.id in following_ids(user.id)
+
+
+def invalidate(user_id):
+    # сейчас и после коммита: иначе параллельный запрос успеет положить
+    # в кэш состояние до записи
+    key = graph_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
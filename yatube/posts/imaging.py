@@ -0,0 +1,73 @@
+"""Работа с пикселями картинок без Django.
+
+Функции отсюда выполняются в пуле процессов загрузок (posts.uploads),
+который запускается через forkserver: дочерний процесс импортирует
+только этот модуль и Pillow, без настроек и моделей.
+"""
+import warnings
+from base64 import b64encode
+from io import BytesIO
+
+from PIL import Image, ImageFilter, ImageOps
+
+# Заглушка карточки: пропорции 960x339, браузер растягивает её сам
+PLACEHOLDER_SIZE = (24, 8)
+
+
+class ImageRejected(Exception):
+    """Картинку нельзя принять; текст исключения — для пользователя."""
+
+
+def image_meta(data):
+    """(ширина, высота, заглушка) по байтам картинки.
+
+    Заглушка — крошечная размытая JPEG-копия кадра карточки в виде
+    data URI, её можно сразу отдать фоном до загрузки миниатюры.
+    """
+    with Image.open(BytesIO(data)) as image:
+        width, height = image.size
+        # JPEG декодируется сразу в уменьшенном виде
+        image.draft('RGB', (PLACEHOLDER_SIZE[0] * 8, PLACEHOLDER_SIZE[1] * 8))
+        preview = ImageOps.fit(image.convert('RGB'), PLACEHOLDER_SIZE)
+    preview = preview.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    preview.save(buffer, 'JPEG', quality=40)
+    placeholder = b64encode(buffer.getvalue()).decode()
+    return width, height, f'data:image/jpeg;base64,{placeholder}'
+
+
+def sanitize(source, max_pixels, quality):
+    """Декодирует и перекодирует картинку; выполняется в пуле.
+
+    source — путь к временному файлу или байты. Возвращает
+    (байты, расширение, ширина, высота, заглушка). Метаданные (EXIF
+    и прочие) не переносятся: копируются только пиксели с учётом
+    ориентации.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    try:
+        # Pillow проверяет размер по заголовку, ещё до декодирования
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(source)
+    except (Image.DecompressionBombWarning, Image.DecompressionBombError):
+        raise ImageRejected(f'Картинка больше {max_pixels} пикселей')
+    with image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info
+        )
+        buffer = BytesIO()
+        if has_alpha:
+            image.convert('RGBA').save(buffer, 'PNG', optimize=True)
+            extension = 'png'
+        else:
+            image.convert('RGB').save(
+                buffer, 'JPEG', quality=quality,
+                optimize=True, progressive=True,
+            )
+            extension = 'jpg'
+    data = buffer.getvalue()
+    return (data, extension) + image_meta(data)
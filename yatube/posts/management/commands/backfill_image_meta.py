@@ -0,0 +1,80 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from posts import versions
+from posts.models import Post
+from posts.imaging import image_meta
+
+BATCH_SIZE = 100
+
+
+def read_image(post):
+    with post.image.open('rb') as image:
+        return image.read()
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает размеры и заглушки для картинок постов, '
+        'у которых их ещё нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='число процессов (по умолчанию — по числу ядер)',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='пересчитать и уже заполненные картинки',
+        )
+
+    def handle(self, *args, workers, **options):
+        posts = Post.objects.exclude(image='').order_by('id').only('image')
+        if not options['all']:
+            posts = posts.filter(image_width__isnull=True)
+        total = failed = 0
+        # процессы получают байты, а не имена файлов: им не нужны ни
+        # Django, ни доступ к хранилищу
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            last_id = 0
+            while True:
+                batch = list(posts.filter(id__gt=last_id)[:BATCH_SIZE])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                ready = []
+                for post in batch:
+                    try:
+                        post.data = read_image(post)
+                    except OSError as error:
+                        failed += 1
+                        self.stderr.write(f'{post.image.name}: {error}')
+                    else:
+                        ready.append(post)
+                futures = [
+                    (post, pool.submit(image_meta, post.data))
+                    for post in ready
+                ]
+                done = []
+                for post, future in futures:
+                    try:
+                        meta = future.result()
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f'{post.image.name}: {error}')
+                        continue
+                    (post.image_width, post.image_height,
+                     post.image_placeholder) = meta
+                    done.append(post)
+                Post.objects.bulk_update(
+                    done,
+                    ['image_width', 'image_height', 'image_placeholder'],
+                )
+                # bulk_update не шлёт сигналов: карточки и страницы с
+                # этими постами сбрасываем сами
+                versions.bump(*(f'card:post:{post.id}' for post in done))
+                total += len(done)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {total}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры POST_THUMBNAILS для уже загруженных картинок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS or 1,
+            help='число потоков нарезки',
+        )
+
+    def handle(self, *args, workers, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        total = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(
+                thumbnails.generate_in_thread, names.iterator()
+            ):
+                total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {total}'
+        ))
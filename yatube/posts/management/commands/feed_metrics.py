@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts import metrics
+from posts.feeds import METRICS
+
+
+class Command(BaseCommand):
+    help = 'Показывает счётчики раскладки и слияния лент подписок.'
+
+    def handle(self, *args, **options):
+        metrics.gauge('feed.fanout_threshold', settings.FEED_FANOUT_THRESHOLD)
+        metrics.gauge('feed.pull_cutoff', settings.FEED_PULL_CUTOFF)
+        for name, value in metrics.snapshot(METRICS).items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts.media_gc import Collector
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок и миниатюры, на которые ничто не '
+        'ссылается. Прерванный запуск продолжается с того же места.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='только показать, что было бы удалено',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='не трогать файлы моложе стольких секунд',
+        )
+        parser.add_argument(
+            '--chunk', type=int, default=500,
+            help='сколько файлов сверять с базой за раз',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=None,
+            help='не больше стольких проверок в секунду',
+        )
+        parser.add_argument(
+            '--state', default=settings.MEDIA_GC_STATE,
+            help='файл с позицией для продолжения',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='начать с начала, забыв сохранённую позицию',
+        )
+
+    def handle(self, *args, **options):
+        collector = Collector(
+            state_path=options['state'],
+            dry_run=options['dry_run'],
+            min_age=options['min_age'],
+            chunk_size=options['chunk'],
+            rate=options['rate'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        if options['restart']:
+            collector.state = {}
+        found = collector.run()
+        verb = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: картинок {found["media"]}, '
+            f'исходников в KV {found["sources"]}, '
+            f'миниатюр {found["thumbnails"]}'
+        ))
@@ -0,0 +1,111 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from posts import counters, graph, timeline, versions
+from posts.models import Follow, User
+from posts.utils import chunked
+
+# сколько id отдавать в один запрос с IN при пересчёте
+RECOUNT_BATCH = 500
+
+
+def read_edges(stream, format_):
+    """Пары (подписчик, автор) из CSV с колонками user,author или NDJSON."""
+    if format_ == 'csv':
+        for row in csv.DictReader(stream):
+            user, author = row['user'], row['author']
+            if user is None or author is None:
+                raise ValueError(f'не хватает колонок в строке {row}')
+            yield user.strip(), author.strip()
+    else:
+        for line in stream:
+            if line.strip():
+                edge = json.loads(line)
+                yield str(edge['user']), str(edge['author'])
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует подписки из CSV (колонки user,author) или NDJSON '
+        '({"user": …, "author": …}). Уже существующие подписки пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл или - для stdin')
+        parser.add_argument(
+            '--format', choices=('csv', 'ndjson'), default=None,
+            help='по умолчанию — по расширению файла',
+        )
+        parser.add_argument(
+            '--key', choices=('username', 'id'), default='username',
+            help='чем в файле заданы пользователи',
+        )
+        parser.add_argument('--chunk', type=int, default=1000)
+
+    def resolve(self, values, key):
+        if key == 'id':
+            ids = {int(value) for value in values if value.isdigit()}
+            found = User.objects.filter(id__in=ids).values_list('id', 'id')
+            return {str(value): user_id for value, user_id in found}
+        return dict(
+            User.objects.filter(username__in=values).values_list(
+                'username', 'id'
+            )
+        )
+
+    def repair(self, edges):
+        """Производное состояние для вставленной пачки подписок.
+
+        bulk_create не шлёт сигналов, поэтому счётчики, ленты, кэш
+        подписок и версии страниц обновляются здесь — сразу после каждой
+        пачки, чтобы ошибка в следующих строках не оставила уже
+        записанные подписки без них.
+        """
+        if not edges:
+            return
+        followers = {edge.user_id for edge in edges}
+        user_ids = sorted(followers | {edge.author_id for edge in edges})
+        for batch in chunked(user_ids, RECOUNT_BATCH):
+            with transaction.atomic():
+                counters.recount_authors(batch)
+        timeline.mark_pulled({edge.author_id for edge in edges})
+        for edge in edges:
+            timeline.backfill(edge.user_id, edge.author_id)
+        for user_id in followers:
+            graph.invalidate(user_id)
+        versions.bump(*(f'author:{user_id}' for user_id in user_ids))
+
+    def handle(self, *args, path, key, chunk, **options):
+        format_ = options['format']
+        if format_ is None:
+            is_ndjson = path.endswith(('.ndjson', '.jsonl'))
+            format_ = 'ndjson' if is_ndjson else 'csv'
+        stream = sys.stdin if path == '-' else open(path, newline='')
+        total = skipped = 0
+        try:
+            for batch in chunked(read_edges(stream, format_), chunk):
+                users = self.resolve(
+                    {value for edge in batch for value in edge}, key
+                )
+                edges = []
+                for user, author in batch:
+                    user_id, author_id = users.get(user), users.get(author)
+                    if None in (user_id, author_id) or user_id == author_id:
+                        skipped += 1
+                        continue
+                    edges.append(Follow(user_id=user_id, author_id=author_id))
+                with transaction.atomic():
+                    Follow.objects.bulk_create(edges, ignore_conflicts=True)
+                self.repair(edges)
+                total += len(edges)
+        except (KeyError, ValueError, csv.Error) as error:
+            raise CommandError(f'Некорректная строка: {error}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Подписок обработано: {total}, пропущено: {skipped}'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, авторов '
+        'и ссылок на картинки.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            authors = counters.recount_authors()
+            posts = counters.recount_comments()
+            images = counters.recount_images()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано авторов: {authors}, постов: {posts}, '
+            f'картинок: {images}'
+        ))
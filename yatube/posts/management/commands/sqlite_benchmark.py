@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts.sqlite import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX post_pub_date ON post (pub_date, id)',
+)
+READ = 'SELECT id, text FROM post ORDER BY pub_date DESC, id DESC LIMIT 10'
+WRITE = 'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)'
+
+
+def run(path, pragmas, seconds, writers, readers):
+    """Гоняет писателей и читателей по базе path, возвращает счётчики."""
+    stats = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(write):
+        connection = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(connection, pragmas)
+        done = locked = 0
+        while time.monotonic() < deadline:
+            try:
+                if write:
+                    # как сохранение поста: короткая транзакция записи
+                    connection.execute('BEGIN IMMEDIATE')
+                    connection.execute(WRITE, (1, 'x' * 200, time.time()))
+                    connection.execute('COMMIT')
+                else:
+                    connection.execute(READ).fetchall()
+                done += 1
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                locked += 1
+        connection.close()
+        with lock:
+            stats['writes' if write else 'reads'] += done
+            stats['locked'] += locked
+
+    threads = [
+        threading.Thread(target=worker, args=(write,))
+        for write in [True] * writers + [False] * readers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite по умолчанию и профиль SQLITE_PRAGMAS на '
+        'временной базе: конкурентные записи и чтения ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, seconds, writers, readers, rows, **options):
+        profiles = {
+            # busy_timeout как у sqlite3.connect по умолчанию — 5 секунд
+            'по умолчанию': {'busy_timeout': 5000},
+            'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS,
+        }
+        for name, pragmas in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                connection = sqlite3.connect(path)
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                connection.executemany(WRITE, (
+                    (1, 'x' * 200, i) for i in range(rows)
+                ))
+                connection.commit()
+                connection.close()
+                stats = run(path, pragmas, seconds, writers, readers)
+            self.stdout.write(
+                f'{name}: записей {stats["writes"] / seconds:.0f}/с, '
+                f'чтений {stats["reads"] / seconds:.0f}/с, '
+                f'ошибок блокировки {stats["locked"]}'
+            )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание SQLite по расписанию: контрольная точка WAL, '
+        'а с флагами — ANALYZE и VACUUM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkpoint', choices=CHECKPOINT_MODES, default='TRUNCATE',
+            help='режим wal_checkpoint; TRUNCATE ещё и обрезает файл WAL',
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='обновить статистику планировщика',
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help='пересобрать файл базы; блокирует запись на время работы',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, checkpoint, analyze, vacuum, database,
+               **options):
+        connection = connections[database]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'База {database} — не SQLite')
+        if vacuum and connection.in_atomic_block:
+            raise CommandError('VACUUM нельзя выполнить внутри транзакции')
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA wal_checkpoint({checkpoint})')
+            busy, log, checkpointed = cursor.fetchone()
+            if log < 0:
+                self.stdout.write('База не в режиме WAL')
+            else:
+                self.stdout.write(
+                    f'Контрольная точка {checkpoint}: страниц в WAL {log}, '
+                    f'перенесено {checkpointed}'
+                    + (', база занята' if busy else '')
+                )
+            if analyze:
+                cursor.execute('ANALYZE')
+                self.stdout.write('ANALYZE выполнен')
+            if vacuum:
+                cursor.execute('VACUUM')
+                self.stdout.write('VACUUM выполнен')
+        self.stdout.write(self.style.SUCCESS('Готово'))
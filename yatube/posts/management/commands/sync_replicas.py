@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики DATABASE_REPLICAS '
+        'через backup API. С --interval работает как постоянная задача.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='повторять каждые N секунд',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=1024,
+            help='страниц за шаг; между шагами основная база свободна',
+        )
+
+    def sync(self, pages):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite')
+        source.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                source.connection.backup(target, pages=pages)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: обновлена')
+
+    def handle(self, *args, interval, pages, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS пуст')
+        while True:
+            self.sync(pages)
+            if interval is None:
+                return
+            time.sleep(interval)
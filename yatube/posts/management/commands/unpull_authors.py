@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает по лентам посты авторов, у которых подписчиков стало '
+        'меньше порога гибридной ленты. Запускается по расписанию.'
+    )
+
+    def handle(self, *args, **options):
+        author_ids = timeline.unpull_candidates()
+        for author_id in author_ids:
+            timeline.unpull(author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов разложено по лентам: {len(author_ids)}'
+        ))
@@ -0,0 +1,194 @@
+"""Сборка мусора в медиа: файлы картинок и миниатюры без ссылок.
+
+Три прохода, каждый потоково и пачками по chunk_size:
+
+* media — файлы в posts/, на которые не ссылаются ни Post, ни ImageBlob;
+* sources — записи KV sorl об исходниках, которых больше нет у постов
+  (вместе с ними удаляются их миниатюры);
+* thumbnails — файлы в каталоге миниатюр, о которых не знает KV.
+
+Позиция каждого прохода пишется в файл состояния после каждой пачки,
+так что прерванный запуск продолжается с того же места.
+"""
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+from posts import blobs
+from posts.models import ImageBlob, Post
+from posts.storage import post_images
+from posts.utils import chunked
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+PHASES = ('media', 'sources', 'thumbnails')
+
+
+def walk(storage, top, after=None):
+    """Имена файлов под top в порядке обхода в глубину по алфавиту.
+
+    Читается по одному каталогу за раз. Файлы не дальше after (по частям
+    пути) пропускаются, а каталоги целиком раньше него не открываются.
+    """
+    after = tuple(after.split('/')) if after else ()
+    stack = [top.rstrip('/')]
+    while stack:
+        path = stack.pop()
+        parts = tuple(path.split('/'))
+        if after and parts < after[:len(parts)]:
+            continue
+        if not storage.exists(path):
+            continue
+        dirs, files = storage.listdir(path)
+        for name in sorted(files):
+            if tuple(f'{path}/{name}'.split('/')) > after:
+                yield f'{path}/{name}'
+        stack.extend(f'{path}/{name}' for name in sorted(dirs, reverse=True))
+
+
+class Collector:
+    def __init__(self, state_path=None, dry_run=False, min_age=3600,
+                 chunk_size=500, rate=None, log=None):
+        self.state_path = state_path
+        self.dry_run = dry_run
+        self.min_age = timedelta(seconds=min_age)
+        self.chunk_size = chunk_size
+        self.rate = rate
+        self.log = log
+        self.state = self.load_state()
+        self.found = dict.fromkeys(PHASES, 0)
+
+    def load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path) as state_file:
+                return json.load(state_file)
+        return {}
+
+    def save_state(self):
+        # пробный запуск ничего не меняет, в том числе позицию
+        if not self.state_path or self.dry_run:
+            return
+        with open(self.state_path + '.tmp', 'w') as state_file:
+            json.dump(self.state, state_file)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def checkpoint(self, phase, position, started, count):
+        self.state[phase] = position
+        self.save_state()
+        if self.rate:
+            # не больше rate проверок в секунду на живом диске
+            delay = count / self.rate - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def report(self, phase, name):
+        self.found[phase] += 1
+        if self.log is not None:
+            self.log(f'{phase}: {name}')
+
+    def is_old(self, storage, name):
+        try:
+            modified = storage.get_modified_time(name)
+        except OSError:
+            return False
+        return modified < timezone.now() - self.min_age
+
+    def media(self, after):
+        """Файлы картинок без ссылок: файл и его миниатюры удаляются."""
+        for chunk in chunked(walk(post_images, 'posts', after),
+                             self.chunk_size):
+            started = time.monotonic()
+            referenced = set(
+                Post.objects.filter(image__in=chunk).values_list(
+                    'image', flat=True
+                )
+            ) | set(
+                ImageBlob.objects.filter(name__in=chunk).values_list(
+                    'name', flat=True
+                )
+            )
+            for name in chunk:
+                if name in referenced or not self.is_old(post_images, name):
+                    continue
+                self.report('media', name)
+                if not self.dry_run:
+                    blobs.discard(name)
+            self.checkpoint('media', chunk[-1], started, len(chunk))
+
+    def sources(self, after):
+        """Исходники в KV, которых нет у постов, и их миниатюры.
+
+        Сюда же попадают исходники, записанные под другим хранилищем:
+        шаблоны ищут миниатюры только по ключам post_images.
+        """
+        prefix = add_prefix('', 'thumbnails')
+        rows = KVStoreModel.objects.filter(
+            key__startswith=prefix
+        ).order_by('key').values_list('key', flat=True)
+        storage = ImageFile('posts', post_images).serialize_storage()
+        last = after or prefix
+        while True:
+            chunk = list(rows.filter(key__gt=last)[:self.chunk_size])
+            if not chunk:
+                return
+            started = time.monotonic()
+            last = chunk[-1]
+            images = KVStoreModel.objects.filter(
+                key__in=[add_prefix(del_prefix(key)) for key in chunk]
+            ).values_list('value', flat=True)
+            sources = [deserialize_image_file(value) for value in images]
+            referenced = set(
+                Post.objects.filter(
+                    image__in=[source.name for source in sources]
+                ).values_list('image', flat=True)
+            )
+            for source in sources:
+                if (source.serialize_storage() == storage
+                        and source.name in referenced):
+                    continue
+                self.report('sources', source.name)
+                if not self.dry_run:
+                    default.kvstore.delete(source)
+            self.checkpoint('sources', last, started, len(chunk))
+
+    def thumbnails(self, after):
+        """Файлы миниатюр, которых нет в KV."""
+        storage = default.storage
+        top = thumbnail_settings.THUMBNAIL_PREFIX
+        for chunk in chunked(walk(storage, top, after), self.chunk_size):
+            started = time.monotonic()
+            keys = {
+                add_prefix(ImageFile(name, storage).key): name
+                for name in chunk
+            }
+            known = set(
+                KVStoreModel.objects.filter(key__in=keys).values_list(
+                    'key', flat=True
+                )
+            )
+            for key, name in keys.items():
+                if key in known or not self.is_old(storage, name):
+                    continue
+                self.report('thumbnails', name)
+                if not self.dry_run:
+                    storage.delete(name)
+            self.checkpoint('thumbnails', chunk[-1], started, len(chunk))
+
+    def run(self):
+        for phase in PHASES:
+            position = self.state.get(phase)
+            if position is True:
+                continue
+            getattr(self, phase)(position)
+            self.state[phase] = True
+            self.save_state()
+        # полный проход завершён: следующий запуск начнётся с начала
+        if self.state_path and not self.dry_run:
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+        return self.found
@@ -0,0 +1,24 @@
+"""Простые счётчики и показатели лент в общем кэше."""
+from django.core.cache import cache
+
+PREFIX = 'metrics:'
+
+
+def incr(name, delta=1):
+    key = PREFIX + name
+    if not cache.add(key, delta, timeout=None):
+        try:
+            cache.incr(key, delta)
+            # incr части бэкендов ставит ключу timeout по умолчанию
+            cache.touch(key, timeout=None)
+        except ValueError:
+            cache.set(key, delta, timeout=None)
+
+
+def gauge(name, value):
+    cache.set(PREFIX + name, value, timeout=None)
+
+
+def snapshot(names):
+    values = cache.get_many([PREFIX + name for name in names])
+    return {name: values.get(PREFIX + name) for name in names}
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    # до флага автор читался на лету, пока подписчиков не меньше порога
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    threshold = getattr(settings, 'FEED_FANOUT_THRESHOLD', None)
+    if threshold is not None:
+        AuthorStats.objects.filter(
+            followers_count__gte=threshold
+        ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_image_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pulled',
+            field=models.BooleanField(default=False, verbose_name='Посты читаются на лету'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from posts.storage import post_images
 
 User = get_user_model()
 
@@ -53,14 +54,58 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_images,
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
+    # Заполняются при загрузке картинки (PostForm) или командой
+    # backfill_image_meta, чтобы шаблонам не открывать файл
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False,
+        help_text='Размытое превью карточки как data URI',
+    )
 
     class Meta:
         default_related_name = 'posts'
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        # Ключ ленты (pub_date, id) целиком в индексе: страницы читаются
+        # диапазоном без временной сортировки.
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_date_idx',
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='posts_post_date_idx',
+            ),
+            # поиск постов по файлу картинки для счётчиков ссылок
+            models.Index(fields=['image'], name='posts_post_image_idx'),
+        ]
 
     def __str__(self):
         # выводим текст поста c ограничением символов
@@ -77,6 +122,12 @@ class Comment(models.Model):
 
     class Meta:
         default_related_name = 'comments'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='posts_comment_post_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -87,3 +138,67 @@ class Follow(models.Model):
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Строка материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # копия Post.pub_date, чтобы лента читалась одним диапазоном индекса
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_timeline_user_date_idx',
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, поддерживаемые при записи."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField('Число подписчиков',
+                                                  default=0)
+    following_count = models.PositiveIntegerField('Число подписок',
+                                                  default=0)
+    pulled = models.BooleanField('Посты читаются на лету', default=False)
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class ImageBlob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+    name = models.CharField('Имя файла', max_length=100, primary_key=True)
+    refs = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,143 @@
+"""Кэш целых страниц для анонимных читателей и условные GET.
+
+Вьюха помечает ответ тегами (tag(request, 'post:1', ...)); вместе со
+страницей сохраняются версии тегов из posts.versions. Сигналы поднимают
+версии при записи, и страница с устаревшим тегом считается промахом.
+Из тех же версий строятся ETag и Last-Modified (conditional_page).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from posts import replicas, versions
+from posts.cards import card_names
+
+HEADER = 'X-Page-Cache'
+CACHED_HEADERS = ('Content-Type', 'Content-Language')
+
+
+def tag(request, *names):
+    """Помечает страницу тегами; версии берутся до рендера шаблона."""
+    tags = getattr(request, '_page_cache_tags', None)
+    if tags is not None:
+        tags.update(versions.get_versions(names))
+
+
+def page_key(request):
+    path = request.get_full_path().encode()
+    return 'page:' + hashlib.md5(path).hexdigest()
+
+
+def cache_anonymous_page(view):
+    """Отдаёт анонимам готовую страницу, пока не изменились её теги."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            response = view(request, *args, **kwargs)
+            response[HEADER] = 'BYPASS'
+            return response
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is not None and (
+            versions.get_versions(entry['tags']) == entry['tags']
+        ):
+            response = HttpResponse(entry['content'])
+            for header, value in entry['headers'].items():
+                response[header] = value
+            response[HEADER] = 'HIT'
+            request._page_cache_tags = entry['tags']
+            return response
+        request._page_cache_tags = {}
+        response = view(request, *args, **kwargs)
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies and request._page_cache_tags):
+            cache.set(key, {
+                'content': response.content,
+                'headers': {
+                    header: response[header]
+                    for header in CACHED_HEADERS if response.has_header(header)
+                },
+                'tags': request._page_cache_tags,
+            }, replicas.cache_timeout(settings.PAGE_CACHE_TIMEOUT))
+        response[HEADER] = 'MISS'
+        return response
+    return wrapper
+
+
+def page_etag(request, tags):
+    """ETag страницы: версии её тегов и пользователь, для которого она."""
+    state = repr((sorted(tags.items()), request.user.id))
+    return quote_etag(hashlib.md5(state.encode()).hexdigest())
+
+
+def conditional_page(view):
+    """ETag и Last-Modified по тегам страницы; 304 — без вызова вьюхи.
+
+    Теги страницы запоминаются при первом рендере, поэтому проверка
+    стоит два чтения из кэша: список тегов и их версии.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key = 'etag:' + page_key(request)
+        names = cache.get(key)
+        if names:
+            response = get_conditional_response(
+                request,
+                etag=page_etag(request, versions.get_versions(names)),
+                last_modified=last_modified(names),
+            )
+            if response is not None:
+                patch_vary_headers(response, ('Cookie',))
+                return response
+        request._page_cache_tags = {}
+        response = view(request, *args, **kwargs)
+        tags = request._page_cache_tags
+        if response.status_code != 200 or not tags:
+            return response
+        cache.set(key, list(tags), settings.PAGE_CACHE_TIMEOUT)
+        patch_vary_headers(response, ('Cookie',))
+        modified = last_modified(tags)
+        if replicas.read_replica() and (
+            modified is None
+            or modified > time.time() - settings.REPLICA_LAG
+        ):
+            # реплика могла ещё не догнать последнюю запись: страница
+            # с версиями после записи не должна стать «неизменившейся»
+            return response
+        response['ETag'] = page_etag(request, tags)
+        if modified is not None:
+            response['Last-Modified'] = http_date(modified)
+        return response
+    return wrapper
+
+
+def last_modified(names):
+    # запись в текущую секунду ещё может случиться после ответа
+    modified = versions.last_modified(names)
+    if modified is not None and modified < int(time.time()):
+        return modified
+    return None
+
+
+def post_tags(posts):
+    """Теги карточек постов: авторы, группы и версии самих карточек.
+
+    Комментарии в карточке не видны, поэтому тег post: ставит только
+    post_detail; версия карточки сбрасывает страницу и после нарезки
+    миниатюр.
+    """
+    tags = set()
+    for post in posts:
+        tags.update(card_names(post))
+        tags.add(f'author:{post.author_id}')
+        if post.group is not None:
+            tags.add(f'group:{post.group.slug}')
+    return tags
@@ -0,0 +1,246 @@
+import base64
+import binascii
+import datetime
+import json
+import math
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import (EmptyPage, InvalidPage,
+                                   PageNotAnInteger, Paginator)
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+FEED_KEYS = ('pub_date', 'id')
+# INTEGER в SQLite — знаковое 64-битное
+MAX_INT = 2 ** 63 - 1
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(values, backwards=False):
+    """Упаковывает значения ключа в непрозрачный токен для ?cursor=."""
+    payload = {
+        'v': [
+            {'dt': value.isoformat()}
+            if isinstance(value, datetime.datetime) else value
+            for value in values
+        ],
+        'b': int(backwards),
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def valid_key_value(value):
+    """Можно ли передать значение ключа из токена в SQL без ошибки.
+
+    Подходят только целые в пределах INTEGER, конечные float и даты
+    с часовым поясом; строки, списки и bool до SQL не доходят.
+    """
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -MAX_INT - 1 <= value <= MAX_INT
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, datetime.datetime):
+        return timezone.is_aware(value)
+    return False
+
+
+def decode_cursor(token):
+    """Возвращает (значения ключа, направление назад) из токена."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode())
+        values = tuple(
+            parse_datetime(value['dt']) if isinstance(value, dict) else value
+            for value in payload['v']
+        )
+        backwards = bool(payload.get('b'))
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor('Некорректный курсор')
+    if not all(valid_key_value(value) for value in values):
+        raise InvalidCursor('Некорректный курсор')
+    return values, backwards
+
+
+class KeysetQuerySet:
+    """Источник ленты: queryset, упорядоченный по ключу.
+
+    По умолчанию по убыванию (новые сверху); descending=False — для
+    списков, которые читаются от старых к новым, например комментариев.
+    """
+
+    def __init__(self, queryset, keys=FEED_KEYS, descending=True):
+        self.queryset = queryset
+        self.keys = keys
+        self.descending = descending
+
+    def key(self, obj):
+        return tuple(getattr(obj, name) for name in self.keys)
+
+    def _after(self, cursor, backwards):
+        # (a, b) < (va, vb)  ->  a <= va AND (a < va OR (a = va AND b < vb));
+        # лишнее a <= va даёт SQLite диапазон по индексу вместо перебора.
+        lookup = 'gt' if backwards == self.descending else 'lt'
+        condition = Q()
+        for i, name in enumerate(self.keys):
+            step = Q(**{f'{name}__{lookup}': cursor[i]})
+            for prev_name, prev_value in zip(self.keys[:i], cursor[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return Q(**{f'{self.keys[0]}__{lookup}e': cursor[0]}) & condition
+
+    def fetch(self, cursor, backwards, limit):
+        """Возвращает до limit объектов после (или до) курсора.
+
+        Объекты всегда возвращаются в порядке ленты.
+        """
+        queryset = self.queryset
+        if cursor is not None:
+            if len(cursor) != len(self.keys):
+                raise InvalidCursor('Некорректный курсор')
+            try:
+                queryset = queryset.filter(self._after(cursor, backwards))
+            except (TypeError, ValueError, ValidationError):
+                raise InvalidCursor('Некорректный курсор')
+        prefix = '' if backwards == self.descending else '-'
+        queryset = queryset.order_by(*(prefix + name for name in self.keys))
+        rows = list(queryset[:limit])
+        if backwards:
+            rows.reverse()
+        return rows
+
+
+class WindowPaginator(Paginator):
+    """Пагинатор по номерам с окном ссылок вокруг текущей страницы.
+
+    Страница получает page_window: первые и последние номера, соседей
+    текущей и ELLIPSIS на месте пропусков (get_elided_page_range из
+    Django 3.2). С exact_count=False COUNT(*) не выполняется вовсе:
+    читается на одну запись больше, известна только следующая страница,
+    а page_window равно None.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, exact_count=True, count=None,
+                 on_each_side=2, on_ends=1):
+        super().__init__(object_list, per_page)
+        self.exact_count = exact_count
+        self.count_source = count
+        self.on_each_side = on_each_side
+        self.on_ends = on_ends
+
+    @cached_property
+    def count(self):
+        if self.count_source is not None:
+            return self.count_source()
+        return Paginator.count.func(self)
+
+    def get_elided_page_range(self, number=1):
+        number = self.validate_number(number)
+        on_each_side, on_ends = self.on_each_side, self.on_ends
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def page(self, number):
+        if self.exact_count:
+            page = super().page(number)
+            page.page_window = list(self.get_elided_page_range(page.number))
+            return page
+        number = int(number)
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На странице нет записей')
+        # как у CursorPaginator: число страниц знает только про соседей
+        self.num_pages = number + 1 if len(rows) > self.per_page else number
+        page = self._get_page(rows[:self.per_page], number, self)
+        page.page_window = None
+        return page
+
+    def get_page(self, number):
+        if self.exact_count:
+            return super().get_page(number)
+        try:
+            return self.page(number)
+        except (TypeError, ValueError, PageNotAnInteger, EmptyPage):
+            return self.page(1)
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Принимает queryset или готовый источник с методами key() и fetch().
+    Страница знает только соседей, поэтому шаблоны проверяют is_cursor
+    и строят ссылки по next_cursor / previous_cursor.
+    """
+
+    def __init__(self, object_list, per_page, keys=FEED_KEYS):
+        super().__init__(object_list, per_page)
+        if hasattr(object_list, 'fetch'):
+            self.source = object_list
+        else:
+            self.source = KeysetQuerySet(object_list, keys)
+
+    def _check_object_list_is_ordered(self):
+        # Порядок задаётся ключом курсора, а не queryset.
+        pass
+
+    def cursor_page(self, token):
+        if token:
+            cursor, backwards = decode_cursor(token)
+        else:
+            cursor, backwards = None, False
+        rows = self.source.fetch(cursor, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        if backwards:
+            rows = rows[-self.per_page:]
+            has_previous, has_next = has_more, True
+        else:
+            rows = rows[:self.per_page]
+            has_previous, has_next = cursor is not None, has_more
+        if not rows:
+            has_previous = has_next = False
+        # Страница остаётся обычным Page: номер и число страниц подобраны
+        # так, чтобы штатные has_next()/has_previous() отвечали по курсорам.
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.is_cursor = True
+        page.next_cursor = (
+            encode_cursor(self.source.key(rows[-1]))
+            if rows and has_next else None
+        )
+        page.previous_cursor = (
+            encode_cursor(self.source.key(rows[0]), backwards=True)
+            if rows and has_previous else None
+        )
+        return page
+
+    def get_cursor_page(self, token):
+        """Как get_page: при битом курсоре отдаёт первую страницу."""
+        try:
+            return self.cursor_page(token)
+        except InvalidCursor:
+            return self.cursor_page(None)
@@ -0,0 +1,85 @@
+"""Чтение с реплик и «свои записи видны сразу».
+
+ReplicaRouter отправляет чтения внутри запросов на реплики из
+DATABASE_REPLICAS, а записи и всё вне запросов (команды, пулы миниатюр)
+— на основную базу. ReplicaPinMiddleware закрепляет за основной базой
+небезопасные запросы, запросы, которые уже что-то записали, и всех, кто
+писал в последние REPLICA_PIN_SECONDS секунд: им ставится кука, пока
+реплика не догонит. Реплики SQLite обновляет команда sync_replicas.
+
+Реплика отстаёт до REPLICA_LAG секунд, и прочитанное с неё могло
+устареть уже под новыми версиями кэша. Поэтому кэши, заполненные в
+таком запросе, живут не дольше отставания (cache_timeout), а запрос
+читает с одной реплики от начала до конца.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def use_replica():
+    return (getattr(_state, 'in_request', False)
+            and not _state.pinned and _state.replica is not None)
+
+
+def read_replica():
+    """Читал ли текущий запрос что-нибудь с реплики."""
+    return getattr(_state, 'in_request', False) and _state.read_replica
+
+
+def cache_timeout(timeout):
+    """Время жизни записи кэша, заполненной в текущем запросе."""
+    if read_replica():
+        return min(timeout, settings.REPLICA_LAG)
+    return timeout
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if use_replica():
+            _state.read_replica = True
+            return _state.replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # дальше в этом запросе читаем то, что только что записали
+        _state.pinned = _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплики — копии основной базы, схема приезжает вместе с данными
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.in_request = True
+        _state.wrote = _state.read_replica = False
+        _state.pinned = (request.method not in SAFE_METHODS
+                         or PIN_COOKIE in request.COOKIES)
+        replicas = settings.DATABASE_REPLICAS
+        _state.replica = random.choice(replicas) if replicas else None
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite='Lax',
+                )
+        finally:
+            _state.in_request = False
+        return response
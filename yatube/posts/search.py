@@ -0,0 +1,116 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Таблица posts_post_fts хранит копию текста поста с rowid = Post.id
+и обновляется сигналами; rebuild() пересобирает её целиком.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from posts.models import Post
+from posts.pagination import InvalidCursor, valid_key_value
+
+TABLE = 'posts_post_fts'
+SNIPPET_WORDS = 16
+# Маркеры подсветки вне HTML: текст экранируется уже после snippet()
+MARK_START, MARK_END = '\x02', '\x03'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.id])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.id, post.text],
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+
+
+def match_query(query):
+    """Строка пользователя -> запрос MATCH: все слова, по префиксу.
+
+    Каждое слово берётся в кавычки, поэтому синтаксис FTS5 из ввода
+    не исполняется. Пустая строка -> None.
+    """
+    words = WORD_RE.findall(query or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>'
+    ).replace(MARK_END, '</mark>'))
+
+
+def matching_ids_sql(query):
+    """Подзапрос с id подходящих постов — для фильтра в админке."""
+    return f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [query]
+
+
+class SearchFeed:
+    """Результаты поиска по релевантности для CursorPaginator.
+
+    Ключ курсора — (rank, id): bm25 у FTS5 тем меньше, чем лучше
+    совпадение, поэтому выдача идёт по возрастанию ключа.
+    """
+
+    def __init__(self, query):
+        self.query = query
+
+    def key(self, post):
+        return post.search_rank, post.id
+
+    def fetch(self, cursor, backwards, limit):
+        sql = (
+            f'SELECT rowid, rank, snippet({TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+        )
+        params = [MARK_START, MARK_END, '…', SNIPPET_WORDS, self.query]
+        if cursor is not None:
+            rank, rowid = cursor if len(cursor) == 2 else (None, None)
+            # rank — конечное число, rowid — целое в пределах INTEGER
+            if (not isinstance(rank, (int, float))
+                    or not isinstance(rowid, int)
+                    or not valid_key_value(rank)
+                    or not valid_key_value(rowid)):
+                raise InvalidCursor('Некорректный курсор')
+            op = '<' if backwards else '>'
+            sql += f' AND (rank {op} %s OR (rank = %s AND rowid {op} %s))'
+            params += [cursor[0], cursor[0], cursor[1]]
+        direction = 'DESC' if backwards else 'ASC'
+        sql += f' ORDER BY rank {direction}, rowid {direction} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+        if backwards:
+            rows.reverse()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [row[0] for row in rows]
+        )
+        results = []
+        for post_id, rank, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_rank = rank
+                post.search_snippet = highlight(snippet)
+                results.append(post)
+        return results
@@ -0,0 +1,112 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from posts import (blobs, counters, feeds, follows, search, timeline,
+                   versions)
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+def bump_post_pages(post, group_ids=()):
+    slugs = Group.objects.filter(
+        id__in={post.group_id, *group_ids} - {None}
+    ).values_list('slug', flat=True)
+    versions.bump(
+        f'post:{post.id}',
+        f'card:post:{post.id}',
+        f'author:{post.author_id}',
+        *(f'group:{slug}' for slug in slugs),
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+    # вход пользователя обновляет только last_login — страницы не меняются
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        versions.bump(f'author:{instance.id}', f'card:user:{instance.id}')
+
+
+@receiver(post_init, sender=Group)
+def group_loaded(sender, instance, **kwargs):
+    instance._loaded_slug = instance.slug
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    versions.bump(
+        f'group:{instance.slug}', f'group:{instance._loaded_slug}',
+        f'card:group:{instance.id}',
+    )
+    instance._loaded_slug = instance.slug
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    versions.bump(f'group:{instance.slug}', f'card:group:{instance.id}')
+
+
+def image_name(post):
+    # без обращения к дескриптору: отложенное поле не подгружаем
+    image = post.__dict__.get('image')
+    return getattr(image, 'name', image) or ''
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # группа до правки: пост пропадает и из её ленты
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = image_name(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    versions.bump(*versions.feed_names(
+        instance, [instance._loaded_group_id]
+    ))
+    bump_post_pages(instance, [instance._loaded_group_id])
+    instance._loaded_group_id = instance.group_id
+    if created:
+        counters.change_author(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+    image = image_name(instance)
+    previous = '' if created else instance._loaded_image
+    if image != previous:
+        blobs.acquire(image)
+        blobs.release(previous)
+    instance._loaded_image = image
+    feeds.ring_push(instance)
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    versions.bump(*versions.feed_names(instance))
+    bump_post_pages(instance)
+    counters.change_author(instance.author_id, posts_count=-1)
+    blobs.release(image_name(instance))
+    feeds.ring_remove(instance)
+    search.unindex_post(instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments(instance.post_id, 1)
+    versions.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+    versions.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, instance.author_id)
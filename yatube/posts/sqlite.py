@@ -0,0 +1,29 @@
+"""Профиль SQLite для продакшена: WAL, mmap и ожидание блокировок.
+
+С SQLITE_PROFILE = True прагмы SQLITE_PRAGMAS выполняются на каждом
+новом соединении, а CONN_MAX_AGE держит соединения открытыми, чтобы
+не платить за это на каждом запросе. В WAL читатели не ждут писателей,
+а писатели ждут друг друга до busy_timeout вместо «database is locked».
+Контрольные точки WAL, ANALYZE и VACUUM — команда sqlite_maintenance.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет прагмы на соединении sqlite3 (не обёртке Django)."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+def configure(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        # напрямую, мимо курсора Django: в журнал запросов не попадает
+        apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
+
+
+def connect():
+    if settings.SQLITE_PROFILE:
+        connection_created.connect(
+            configure, dispatch_uid='posts.sqlite.configure'
+        )
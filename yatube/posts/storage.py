@@ -0,0 +1,41 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл получает имя по sha256 содержимого (posts/ab/abcdef….jpg), и
+повторная загрузка той же картинки переиспользует уже лежащий файл
+вместе с его миниатюрами. Ссылки на файлы считает posts.blobs.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # каталог upload_to сохраняется, имя файла заменяется хешем
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+post_images = ContentAddressedStorage()
@@ -0,0 +1,52 @@
+from django import template
+from posts.cards import render_cards
+from posts.thumbnails import card_thumbnails, card_variants
+
+register = template.Library()
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+@register.inclusion_tag('includes/card_picture.html')
+def card_picture(post, lazy=True):
+    """<picture> карточки: srcset по ширинам в каждом формате.
+
+    Миниатюры нарезает пул после загрузки или backfill_thumbnails,
+    рендер страницы сам картинки не открывает: готовые берутся из
+    card_thumbnails (лента разрешает их пакетом в resolve_cards), а пока
+    нарезки нет — показывается исходная картинка. Размеры и размытая
+    заглушка берутся из полей поста, файл при рендере не открывается.
+    """
+    found = getattr(post, 'card_thumbnails', None)
+    if found is None:
+        found = card_thumbnails([post])[post.id]
+    sources = []
+    for format_, widths in card_variants():
+        srcset = ', '.join(
+            f'{found[size].url} {width}w'
+            for width, size in widths if size in found
+        )
+        if srcset:
+            sources.append({
+                'type': MIME_TYPES.get(format_, f'image/{format_.lower()}'),
+                'srcset': srcset,
+            })
+    fallback = found.get('card')
+    if fallback is not None:
+        width, height = fallback.width, fallback.height
+    else:
+        width, height = post.image_width, post.image_height
+    return {
+        'sources': sources,
+        'src': fallback.url if fallback else post.image.url,
+        'width': width,
+        'height': height,
+        'placeholder': post.image_placeholder,
+        'lazy': lazy,
+    }
+
+
+@register.simple_tag
+def post_cards(posts, group_link=True):
+    """Карточки постов страницы из общего кэша (posts.cards)."""
+    return render_cards(posts, group_link)
@@ -1,18 +1,31 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO, StringIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from posts import versions
 from posts.models import Comment, Group, Post
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTests(TestCase):
@@ -74,6 +87,78 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post_1.author, self.user)
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    def test_image_meta_saved_with_upload(self):
+        """При загрузке картинки сохраняются её размеры и заглушка"""
+        uploaded = SimpleUploadedFile(
+            name='meta.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': uploaded},
+        )
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        Post.objects.filter(id=post.id).update(
+            image_width=None, image_height=None, image_placeholder=''
+        )
+        version = versions.get_version(f'card:post:{post.id}')
+        call_command('backfill_image_meta', workers=1, stdout=StringIO())
+        self.assertNotEqual(
+            versions.get_version(f'card:post:{post.id}'), version
+        )
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertNotEqual(post.image_placeholder, '')
+
+    @override_settings(POST_IMAGE_MAX_BYTES=16)
+    def test_oversized_upload_rejected(self):
+        """Файл больше лимита не дочитывается и не сохраняется"""
+        uploaded = SimpleUploadedFile(
+            name='big.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Слишком большая', 'image': uploaded},
+        )
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertFalse(Post.objects.filter(text='Слишком большая').exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1)
+    def test_pixel_limit(self):
+        """Картинка с лишними пикселями отклоняется"""
+        uploaded = SimpleUploadedFile(
+            name='wide.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Много пикселей', 'image': uploaded},
+        )
+        self.assertTrue(response.context['form'].has_error('image'))
+
+    def test_upload_reencoded_without_exif(self):
+        """Загрузка перекодируется: EXIF снят, ориентация применена"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (4, 2)).save(buffer, 'JPEG', exif=exif.tobytes())
+        uploaded = SimpleUploadedFile(
+            name='photo.jpeg', content=buffer.getvalue(),
+            content_type='image/jpeg',
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Фото')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (2, 4))
+            self.assertNotIn('exif', image.info)
+
     def test_guest_new_post(self):
         """Неавторизоанный пользователь не может создавать посты"""
         form_data = {
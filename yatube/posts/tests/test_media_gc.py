@@ -0,0 +1,66 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from posts.models import Post
+from posts.storage import post_images
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaGarbageCollectorTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            author=author, text='Пост',
+            image=SimpleUploadedFile('kept.gif', b'kept image'),
+        )
+        self.orphan = post_images.save(
+            'posts/orphan.gif', ContentFile(b'orphan image')
+        )
+        self.thumbnail = default_storage.save(
+            'cache/00/00/stale.jpg', ContentFile(b'stale thumbnail')
+        )
+        self.state = os.path.join(TEMP_MEDIA_ROOT, 'gc.json')
+
+    def gc(self, *args):
+        call_command(
+            'gc_media', '--min-age', '0', '--state', self.state, *args,
+            stdout=StringIO(),
+        )
+
+    def test_dry_run_then_delete(self):
+        """Пробный запуск ничего не удаляет, обычный удаляет сирот"""
+        self.gc('--dry-run')
+        self.assertTrue(post_images.exists(self.orphan))
+        self.assertTrue(default_storage.exists(self.thumbnail))
+        self.gc()
+        self.assertFalse(post_images.exists(self.orphan))
+        self.assertFalse(default_storage.exists(self.thumbnail))
+        self.assertTrue(post_images.exists(self.post.image.name))
+        self.assertFalse(os.path.exists(self.state))
+
+    def test_resumes_from_saved_position(self):
+        """Прерванный проход продолжается после сохранённой позиции"""
+        with open(self.state, 'w') as state_file:
+            json.dump({'media': self.orphan, 'sources': True}, state_file)
+        self.gc()
+        self.assertTrue(post_images.exists(self.orphan))
+        self.assertFalse(default_storage.exists(self.thumbnail))
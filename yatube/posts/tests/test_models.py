@@ -1,7 +1,15 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
 
-from ..models import Group, Post
+from ..models import AuthorStats, Comment, Follow, Group, ImageBlob, Post
+from ..storage import post_images
 
 User = get_user_model()
 
@@ -84,3 +92,76 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 text = task._meta.get_field(field).help_text
                 self.assertEqual(text, help_text)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def assertStats(self, user, **expected):
+        stats = AuthorStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении записей"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.reader, following_count=1)
+        comment.delete()
+        follow.delete()
+        self.post.delete()
+        self.assertStats(self.author, posts_count=0, followers_count=0)
+        self.assertStats(self.reader, following_count=0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет разошедшиеся счётчики"""
+        AuthorStats.objects.update(posts_count=42)
+        Post.objects.update(comments_count=7)
+        call_command('recount', stdout=StringIO())
+        self.assertStats(self.author, posts_count=1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageBlobTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.author,
+            text='Мем',
+            image=SimpleUploadedFile(name, b'GIF89a same bytes'),
+        )
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def test_identical_images_share_one_file(self):
+        """Одинаковые картинки хранятся одним файлом до последней ссылки"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 2)
+        first.delete()
+        self.assertTrue(post_images.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 1)
+        second.delete()
+        self.assertFalse(post_images.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
@@ -0,0 +1,78 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент не должны сканировать таблицы и сортировать в памяти"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plan', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(15)
+        ]
+        cls.post = posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertIndexedPlans(self, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    with self.subTest(url=url, sql=sql, plan=detail):
+                        self.assertIsNone(FULL_SCAN.match(detail))
+                        self.assertNotIn('TEMP B-TREE', detail)
+        return response
+
+    def test_feed_plans(self):
+        """Первые и последующие страницы лент читаются по индексам"""
+        urls = [
+            reverse('posts:group_posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            page = self.assertIndexedPlans(url).context['page_obj']
+            self.assertTrue(page.has_next())
+            self.assertIndexedPlans(url, {'cursor': page.next_cursor})
+
+    def test_post_detail_plans(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        for order in ('old', 'new'):
+            self.assertIndexedPlans(url, {'order': order})
+        self.assertIndexedPlans(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'order': 'new'},
+        )
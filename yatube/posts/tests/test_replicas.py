@@ -0,0 +1,92 @@
+import random
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import replicas
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # в тестах реплика — зеркало основной базы (TEST MIRROR)
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.client.force_login(self.author)
+        self.client.cookies.pop(replicas.PIN_COOKIE, None)
+
+    def get_queries(self, url, alias):
+        with CaptureQueriesContext(connections[alias]) as context:
+            self.client.get(url)
+        return [
+            query for query in context.captured_queries
+            if 'posts_post' in query['sql']
+        ]
+
+    def test_reads_go_to_replica(self):
+        url = reverse('posts:group_posts')
+        self.assertTrue(self.get_queries(url, 'replica'))
+        self.assertFalse(self.get_queries(url, 'default'))
+
+    def test_writer_pinned_to_primary(self):
+        """После записи автор читает свою ленту с основной базы"""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежая запись'}
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertTrue(Post.objects.filter(text='Свежая запись').exists())
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertFalse(self.get_queries(url, 'replica'))
+        self.assertTrue(self.get_queries(url, 'default'))
+
+    def test_follow_pins(self):
+        other = User.objects.create_user(username='other')
+        response = self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': other})
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertTrue(self.author.follower.filter(author=other).exists())
+
+    def test_one_replica_per_request(self):
+        with mock.patch(
+            'posts.replicas.random.choice', wraps=random.choice
+        ) as choice:
+            self.client.get(reverse('posts:group_posts'))
+        self.assertEqual(choice.call_count, 1)
+
+    def test_replica_reads_shorten_caches(self):
+        """Кэш, заполненный после чтения с реплики, живёт не дольше лага"""
+        def view(request):
+            timeouts = [replicas.cache_timeout(3600)]
+            Post.objects.exists()
+            timeouts.append(replicas.cache_timeout(3600))
+            return HttpResponse(str(timeouts))
+
+        middleware = replicas.ReplicaPinMiddleware(view)
+        response = middleware(RequestFactory().get('/'))
+        self.assertEqual(
+            response.content.decode(), str([3600, settings.REPLICA_LAG])
+        )
+
+    def test_no_validators_right_after_write(self):
+        """Пока реплика может отставать, ETag странице не выдаётся"""
+        Post.objects.create(author=self.author, text='Запись')
+        response = Client().get(reverse('posts:group_posts'))
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_anonymous_reads_not_pinned(self):
+        client = Client()
+        response = client.get(reverse('posts:group_posts'))
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
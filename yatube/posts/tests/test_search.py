@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import search
+from posts.models import Post
+from posts.pagination import InvalidCursor, encode_cursor
+from posts.views import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.best = Post.objects.create(
+            author=self.author, text='Котики, котики и снова котики'
+        )
+        self.other = Post.objects.create(
+            author=self.author, text='Про собак и одного котика'
+        )
+        Post.objects.create(author=self.author, text='Про погоду')
+        self.client = Client()
+        self.url = reverse('posts:search')
+
+    def test_ranked_results_with_snippets(self):
+        """Результаты отсортированы по релевантности и подсвечены"""
+        response = self.client.get(self.url, {'q': 'котик'})
+        page = response.context['page_obj']
+        self.assertEqual(list(page), [self.best, self.other])
+        self.assertIn('<mark>котика</mark>', page[1].search_snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        self.other.text = 'Про собак'
+        self.other.save()
+        self.best.delete()
+        response = self.client.get(self.url, {'q': 'котик'})
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_query_syntax_and_markup_are_escaped(self):
+        """Операторы FTS5 и разметка из запроса не исполняются"""
+        Post.objects.create(author=self.author, text='<b>котики</b> AND')
+        response = self.client.get(self.url, {'q': '"котики" AND ('})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '<b>котики</b>')
+
+    def test_cursor_pages(self):
+        """Выдача листается курсором, пересборка индекса видит bulk_create"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'погода {i}')
+            for i in range(POSTS_PER_PAGE)
+        )
+        search.rebuild()
+        first = self.client.get(self.url, {'q': 'погод'}).context['page_obj']
+        second = self.client.get(
+            self.url, {'q': 'погод', 'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first) + len(second), POSTS_PER_PAGE + 1)
+        self.assertFalse(set(first) & set(second))
+
+    def test_forged_cursor(self):
+        """Курсор с чужими типами значений отдаёт первую страницу"""
+        feed = search.SearchFeed(search.match_query('котик'))
+        for cursor in (
+            ([1], 2), (1.0, 'x'), (1.0,), (-1.0, 10 ** 30),
+            (float('nan'), 1), (True, 1),
+        ):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    feed.fetch(cursor, False, POSTS_PER_PAGE)
+        for values in (([1], 2), (-1.0, 10 ** 30)):
+            with self.subTest(values=values):
+                response = self.client.get(
+                    self.url, {'q': 'котик', 'cursor': encode_cursor(values)}
+                )
+                self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через FTS5"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other]
+        )
@@ -0,0 +1,33 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from posts.sqlite import apply_pragmas
+
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_applied(self):
+        """Профиль включает WAL и остальные прагмы"""
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(os.path.join(directory, 'db'))
+            apply_pragmas(connection, settings.SQLITE_PRAGMAS)
+            for name, expected in (
+                ('journal_mode', 'wal'),
+                ('synchronous', 1),
+                ('busy_timeout', settings.SQLITE_PRAGMAS['busy_timeout']),
+            ):
+                with self.subTest(pragma=name):
+                    value, = connection.execute(f'PRAGMA {name}').fetchone()
+                    self.assertEqual(value, expected)
+            connection.close()
+
+    def test_maintenance(self):
+        out = StringIO()
+        call_command('sqlite_maintenance', '--analyze', stdout=out)
+        self.assertIn('ANALYZE выполнен', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('sqlite_maintenance', '--vacuum', stdout=out)
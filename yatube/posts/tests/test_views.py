@@ -1,15 +1,26 @@
+import datetime
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
+from importlib import import_module
+from io import StringIO
 
 from django import forms
+from django.apps import apps as django_apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Follow, Group, Post
+from django.utils import timezone
+from posts import cards, counters, thumbnails
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.pagination import WindowPaginator, encode_cursor
 
 User = get_user_model()
 
@@ -57,9 +68,11 @@ class PostTests(TestCase):
 
     def test_cache_index(self):
         """Тестируем кэш до и после очистки"""
+        cache.clear()
         response = self.authorized_client.get('/')
         posts = response.content
-        Post.objects.get(pk=1).delete()
+        # update() не шлёт сигналов: версии прежние, карточка из кэша
+        Post.objects.filter(pk=self.post.pk).update(text='Изменено мимо')
         response_old = self.authorized_client.get('/')
         old_posts = response_old.content
         self.assertEqual(old_posts, posts)
@@ -68,6 +81,90 @@ class PostTests(TestCase):
         new_posts = response_new.content
         self.assertNotEqual(old_posts, new_posts)
 
+    def test_cache_invalidated_by_post_writes(self):
+        """Создание, правка и удаление поста сбрасывают кэш лент"""
+        urls = (
+            reverse('posts:group_posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user_pavel}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        post = Post.objects.create(
+            author=self.user_pavel, group=self.group, text='Свежая запись'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), post.text)
+        post.text = 'Исправленная запись'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), post.text)
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.guest_client.get(url), 'Исправленная запись'
+                )
+
+    def test_cache_is_page_aware(self):
+        """Разные страницы ленты кэшируются отдельно"""
+        cache.clear()
+        Post.objects.bulk_create(
+            Post(author=self.user_pavel, text=f'Запись {i}')
+            for i in range(10)
+        )
+        first = self.guest_client.get('/')
+        second = self.guest_client.get(
+            '/', {'cursor': first.context['page_obj'].next_cursor}
+        )
+        self.assertContains(second, self.post.text)
+        self.assertNotContains(first, self.post.text)
+
+    def test_thumbnail_falls_back_until_generated(self):
+        """Пока миниатюры нет, показываем исходную картинку"""
+        cache.clear()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.authorized_client.get(url)
+        self.assertContains(response, self.post.image.url)
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.card_thumbnails([self.post])[self.post.id].get(
+            'card'
+        )
+        self.assertIsNotNone(thumbnail)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, thumbnail.url)
+
+    def test_thumbnails_resolved_per_page(self):
+        """Миниатюры страницы ленты читаются одним запросом к KV"""
+        cache.clear()
+        thumbnails.generate(self.post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(reverse('posts:group_posts'))
+        kv_queries = [
+            query for query in context.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kv_queries), 1)
+        thumbnail = thumbnails.card_thumbnails([self.post])[self.post.id][
+            'card'
+        ]
+        self.assertContains(response, thumbnail.url)
+
+    def test_card_srcset_lists_generated_widths(self):
+        """Карточка перечисляет в srcset все нарезанные ширины"""
+        cache.clear()
+        thumbnails.generate(self.post.image.name)
+        response = self.guest_client.get(reverse('posts:group_posts'))
+        found = thumbnails.card_thumbnails([self.post])[self.post.id]
+        for format_, widths in thumbnails.card_variants():
+            for width, size in widths:
+                with self.subTest(format=format_, width=width):
+                    thumbnail = found[size]
+                    self.assertContains(response, f'{thumbnail.url} {width}w')
+
     def test_pages_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
         templates_page_names = {
@@ -170,6 +267,144 @@ class PostTests(TestCase):
         super().tearDownClass()
 
 
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='page-cache')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Запись'
+        )
+        self.urls = (
+            reverse('posts:group_posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+
+    def assertCacheStatus(self, status, client=None):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = (client or self.client).get(url)
+                self.assertEqual(response['X-Page-Cache'], status)
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный запрос анонима отдаётся из кэша"""
+        self.assertCacheStatus('MISS')
+        self.assertCacheStatus('HIT')
+
+    def test_authenticated_requests_bypass_cache(self):
+        client = Client()
+        client.force_login(self.author)
+        self.assertCacheStatus('BYPASS', client)
+
+    def test_pages_invalidated_by_tags(self):
+        """Правка поста сбрасывает все страницы с ним"""
+        self.assertCacheStatus('MISS')
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertCacheStatus('MISS')
+
+    def test_comment_invalidates_only_its_post(self):
+        self.assertCacheStatus('MISS')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        detail = self.client.get(self.urls[-1])
+        self.assertEqual(detail['X-Page-Cache'], 'MISS')
+        self.assertContains(detail, 'Комментарий')
+        index = self.client.get(self.urls[0])
+        self.assertEqual(index['X-Page-Cache'], 'HIT')
+
+    def test_group_rename_invalidates_group_pages(self):
+        self.assertCacheStatus('MISS')
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(self.urls[1])
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Новое название')
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отдаётся как 304 без рендера"""
+        client = Client()
+        client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = client.get(url)['ETag']
+                self.assertNotEqual(self.client.get(url)['ETag'], etag)
+                with CaptureQueriesContext(connection) as context:
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse([
+                    query for query in context.captured_queries
+                    if 'posts_' in query['sql']
+                ])
+        etags = [client.get(url)['ETag'] for url in self.urls]
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новый текст')
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='cards')
+        Post.objects.create(
+            author=self.author, group=self.group, text='Запись'
+        )
+        self.posts = Post.objects.select_related('author', 'group')
+
+    def test_cards_shared_and_invalidated(self):
+        """Карточка рендерится один раз и сбрасывается правкой группы"""
+        card, = cards.render_cards(self.posts)
+        self.assertIn('все записи группы', card)
+        self.assertNotIn(
+            'все записи группы',
+            cards.render_cards(self.posts, group_link=False)[0],
+        )
+        # update() не шлёт сигналов: карточка остаётся прежней
+        self.posts.update(text='Изменено мимо')
+        posts = list(self.posts)
+        with self.assertNumQueries(0):
+            self.assertEqual(cards.render_cards(posts), [card])
+        self.group.title = 'Новое название'
+        self.group.save()
+        card, = cards.render_cards(self.posts)
+        self.assertIn('Изменено мимо', card)
+
+    def test_new_posts_keep_cards(self):
+        """Новый пост в группе не перерисовывает чужие карточки"""
+        post = self.posts.get()
+        keys = cards.versions.get_versions(cards.card_names(post))
+        Post.objects.create(
+            author=self.author, group=self.group, text='Ещё запись'
+        )
+        self.assertEqual(
+            cards.versions.get_versions(cards.card_names(post)), keys
+        )
+
+    def test_feeds_show_renamed_author_and_group(self):
+        """Лента показывает новое имя автора и новый адрес группы"""
+        client = Client()
+        client.force_login(self.author)
+        for user_client in (self.client, client):
+            user_client.get('/')
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        self.group.slug = 'renamed'
+        self.group.save()
+        for user_client in (self.client, client):
+            response = user_client.get('/')
+            self.assertContains(response, 'Новое Имя')
+            self.assertContains(response, '/group/renamed/')
+
+
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -189,9 +424,13 @@ class PaginatorViewsTest(TestCase):
             )
             )
         Post.objects.bulk_create(cls.posts)
+        # профиль листается по счётчику автора, а bulk_create его не трогает
+        counters.recount_authors([cls.author.id])
 
     def setUp(self):
         """Создаем пользователя и авторизируем"""
+        # bulk_create не шлёт сигналов и не сбрасывает кэш страниц
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.author)
@@ -231,10 +470,166 @@ class PaginatorViewsTest(TestCase):
             response = self.client.get(tested_url)
             self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_profile_without_stats(self):
+        """Профиль пользователя без строки счётчиков листается по COUNT"""
+        self.author.stats.delete()
+        url = reverse('posts:profile', kwargs={'username': 'test_name'})
+        response = self.guest_client.get(url + '?page=2')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages(self):
+        """Тестируем переход по курсорам вперёд и назад"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test_slug2'})
+        first_page = self.client.get(url).context['page_obj']
+        self.assertTrue(first_page.is_cursor)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            [post.id for post in [*first_page, *second_page]],
+            list(self.group.posts.order_by('-pub_date', '-id')
+                 .values_list('id', flat=True)),
+        )
+        back_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+
+    def test_page_window(self):
+        """Номера страниц выводятся окном с пропусками"""
+        paginator = WindowPaginator(range(1000), 10)
+        ellipsis = WindowPaginator.ELLIPSIS
+        self.assertEqual(
+            paginator.page(50).page_window,
+            [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100],
+        )
+        self.assertEqual(
+            paginator.page(2).page_window, [1, 2, 3, 4, ellipsis, 100]
+        )
+        self.assertEqual(
+            WindowPaginator(range(30), 10).page(1).page_window, [1, 2, 3]
+        )
+
+    @override_settings(FEED_EXACT_COUNT=False)
+    def test_pages_without_count(self):
+        """Без подсчёта записей известна только следующая страница"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test_slug2'})
+        with CaptureQueriesContext(connection) as context:
+            page = self.client.get(url, {'page': 1}).context['page_obj']
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'COUNT(' in query['sql']
+        ])
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.has_next())
+        self.assertIsNone(page.page_window)
+        page = self.client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_next())
+        page = self.client.get(url, {'page': 99}).context['page_obj']
+        self.assertEqual(page.number, 1)
+
+    def test_page_counts_without_count_queries(self):
+        """Число страниц берётся из счётчиков и кэша, а не из COUNT(*)"""
+        urls = (
+            reverse('posts:group_posts'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug2'}),
+            reverse('posts:profile', kwargs={'username': 'test_name'}),
+        )
+        for url in urls:
+            self.authorized_client.get(url, {'page': 1})
+        Post.objects.bulk_create(
+            Post(text='Мимо сигналов', author=self.author, group=self.group)
+            for _ in range(10)
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    page = self.authorized_client.get(
+                        url, {'page': 1}
+                    ).context['page_obj']
+                self.assertFalse([
+                    query for query in context.captured_queries
+                    if 'COUNT(' in query['sql']
+                ])
+                self.assertEqual(page.paginator.num_pages, 2)
+        # новые посты не пересчитывают главную до истечения FEED_COUNT_TIMEOUT
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.authorized_client.get(urls[0], {'page': 1})
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+        cache.delete('count:feed:index')
+        response = self.authorized_client.get(urls[0], {'page': 1})
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 3)
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Битый курсор отдаёт первую страницу"""
+        response = self.client.get(
+            reverse('posts:group_posts'), {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        post_id = self.group.posts.first().id
+        urls = (
+            reverse('posts:group_posts'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug2'}),
+            reverse('posts:profile', kwargs={'username': 'test_name'}),
+            reverse('posts:post_detail', kwargs={'post_id': post_id}),
+            reverse('posts:post_comments', kwargs={'post_id': post_id}),
+        )
+        naive = datetime.datetime(2020, 1, 1)
+        # подделанные токены: значения не тех типов, целые вне INTEGER,
+        # даты без часового пояса
+        for values in (
+            ('abc', 1), (5, 1), ([1], 2), (True, 1),
+            (naive, 10 ** 30), (timezone.now(), -10 ** 30),
+            (float('inf'), 1), (naive, 1),
+        ):
+            for url in urls:
+                with self.subTest(values=values, url=url):
+                    response = self.client.get(
+                        url, {'cursor': encode_cursor(values)}
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_comment_pages(self):
+        """Комментарии листаются порциями в обоих порядках"""
+        post = self.group.posts.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.author, text=f'Комментарий {i}')
+            for i in range(25)
+        )
+        expected = list(
+            post.comments.order_by('created', 'id')
+            .values_list('id', flat=True)
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        for order, ids in (('old', expected), ('new', expected[::-1])):
+            with self.subTest(order=order):
+                first = self.client.get(url, {'order': order})
+                page = first.context['comments']
+                self.assertEqual([c.id for c in page], ids[:20])
+                more = self.client.get(
+                    reverse('posts:post_comments',
+                            kwargs={'post_id': post.id}),
+                    {'order': order, 'cursor': page.next_cursor},
+                )
+                self.assertTemplateUsed(more, 'includes/comments.html')
+                self.assertEqual(
+                    [c.id for c in more.context['comments']], ids[20:]
+                )
+                self.assertIsNone(more.context['comments'].next_cursor)
+
 
 class FollowTests(TestCase):
     def setUp(self):
         """Добавляем записи в базу"""
+        # множества подписок в кэше переживают откат базы между тестами
+        cache.clear()
         self.client_auth_follower = Client()
         self.client_auth_following = Client()
         self.client_pavel = Client()
@@ -302,6 +697,103 @@ class FollowTests(TestCase):
         )
         self.assertEqual(Follow.objects.all().count(), 0)
 
+    def test_following_flag_from_graph_cache(self):
+        """Флаг подписки в профиле берётся из кэша без запросов"""
+        url = reverse(
+            'posts:profile', kwargs={'username': self.user_following.username}
+        )
+        self.client_auth_follower.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user_following.username},
+        ))
+        self.assertTrue(
+            self.client_auth_follower.get(url).context['following']
+        )
+        with CaptureQueriesContext(connection) as context:
+            self.client_auth_follower.get(url)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'posts_follow' in query['sql']
+        ])
+        self.client_auth_follower.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_following.username},
+        ))
+        self.assertFalse(
+            self.client_auth_follower.get(url).context['following']
+        )
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и отписка не сбивают счётчики"""
+        url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user_following.username},
+        )
+        self.client_auth_follower.get(url)
+        self.client_auth_follower.get(url)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.user_following.stats.refresh_from_db()
+        self.assertEqual(self.user_following.stats.followers_count, 1)
+        url = reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_following.username},
+        )
+        self.client_auth_follower.get(url)
+        self.client_auth_follower.get(url)
+        self.user_following.stats.refresh_from_db()
+        self.assertEqual(self.user_following.stats.followers_count, 0)
+
+    def test_import_follows(self):
+        """Импорт подписок пропускает дубли, себя и неизвестных"""
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_following
+        )
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False
+        ) as edges:
+            edges.write(
+                'user,author\n'
+                'follower,following\n'
+                'pavel,following\n'
+                'pavel,pavel\n'
+                'pavel,nobody\n'
+            )
+        call_command('import_follows', edges.name, stdout=StringIO())
+        os.remove(edges.name)
+        self.assertEqual(
+            Follow.objects.filter(author=self.user_following).count(), 2
+        )
+        self.user_following.stats.refresh_from_db()
+        self.assertEqual(self.user_following.stats.followers_count, 2)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.user_pavel
+            ).values_list('post', flat=True)),
+            [self.post.id]
+        )
+
+    def test_import_follows_bad_row(self):
+        """Пачки до ошибочной строки импортируются вместе со счётчиками"""
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False
+        ) as edges:
+            edges.write(
+                'user,author\n'
+                'follower,following\n'
+                'pavel\n'
+            )
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_follows', edges.name, '--chunk', '1',
+                stdout=StringIO(),
+            )
+        os.remove(edges.name)
+        self.user_following.stats.refresh_from_db()
+        self.assertEqual(self.user_following.stats.followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user_follower).exists()
+        )
+
     def test_follow_by_myself(self):
         """Проверяем может ли пользователь подписаться на себя"""
         count_first = Follow.objects.count()
@@ -340,3 +832,139 @@ class FollowTests(TestCase):
             response,
             'Тестовая запись для тестирования ленты'
         )
+
+    def test_timeline_fan_out_and_prune(self):
+        """Новый пост попадает в ленту подписчика, отписка её чистит"""
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following
+        )
+        new_post = Post.objects.create(
+            author=self.user_following,
+            text='Новая запись после подписки'
+        )
+        response = self.client_auth_follower.get('/follow/')
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+        self.client_auth_follower.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user_following.username}
+            )
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_follower).exists()
+        )
+
+    def test_rebuild_timelines(self):
+        """Команда rebuild_timelines восстанавливает ленты по подпискам"""
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following
+        )
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines')
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.user_follower.id, self.post.id)]
+        )
+
+    def test_migration_fills_timelines(self):
+        """Миграция TimelineEntry заполняет ленты уже подписанных"""
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following
+        )
+        TimelineEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0011_timelineentry')
+        migration.fill_timelines(django_apps, None)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.user_follower.id, self.post.id)]
+        )
+
+    @override_settings(FEED_FANOUT_THRESHOLD=2)
+    def test_hybrid_feed_merges_pulled_authors(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_following
+        )
+        Follow.objects.create(
+            user=self.user_pavel, author=self.user_following
+        )
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_pavel
+        )
+        pushed = Post.objects.create(author=self.user_pavel, text='push')
+        pulled = Post.objects.create(
+            author=self.user_following, text='pull'
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=pulled).exists()
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(post=pushed).exists()
+        )
+        response = self.client_auth_follower.get('/follow/')
+        self.assertEqual(
+            list(response.context['page_obj']), [pulled, pushed, self.post]
+        )
+
+    @override_settings(FEED_FANOUT_THRESHOLD=2)
+    def test_author_under_threshold_back_in_timelines(self):
+        """Посты, написанные выше порога, остаются в ленте после отписок"""
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_following
+        )
+        Follow.objects.create(
+            user=self.user_pavel, author=self.user_following
+        )
+        pulled = Post.objects.create(
+            author=self.user_following, text='pull'
+        )
+        self.client_pavel.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user_following.username}
+            )
+        )
+        # до unpull_authors автор по-прежнему читается на лету
+        response = self.client_auth_follower.get('/follow/')
+        self.assertEqual(
+            list(response.context['page_obj']), [pulled, self.post]
+        )
+        self.assertFalse(TimelineEntry.objects.filter(post=pulled).exists())
+        call_command('unpull_authors', stdout=StringIO())
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user_follower, post=pulled
+            ).exists()
+        )
+        self.user_following.stats.refresh_from_db()
+        self.assertFalse(self.user_following.stats.pulled)
+        response = self.client_auth_follower.get('/follow/')
+        self.assertEqual(
+            list(response.context['page_obj']), [pulled, self.post]
+        )
+
+    @override_settings(FOLLOW_FEED_ENGINE='ring')
+    def test_ring_feed(self):
+        """Лента из кольцевых буферов следит за созданием и удалением"""
+        cache.clear()
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_following
+        )
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_pavel
+        )
+        response = self.client_auth_follower.get('/follow/')
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        new_post = Post.objects.create(author=self.user_pavel, text='ring')
+        response = self.client_auth_follower.get('/follow/')
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+        self.post.delete()
+        response = self.client_auth_follower.get('/follow/')
+        self.assertEqual(list(response.context['page_obj']), [new_post])
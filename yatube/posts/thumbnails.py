@@ -0,0 +1,226 @@
+"""Фоновая нарезка миниатюр sorl для картинок постов.
+
+Все размеры из POST_THUMBNAILS (карточка и её варианты по ширинам и
+форматам для srcset) нарезаются в пуле потоков сразу после сохранения
+поста, а шаблоны только ищут готовую миниатюру в KV-хранилище sorl и,
+пока её нет, показывают исходную картинку.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image
+from posts import versions
+from posts.imaging import image_meta
+from posts.models import Post
+from posts.replicas import cache_timeout
+from posts.storage import post_images
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Бэкенд sorl, знающий имя миниатюры без её создания."""
+
+    def _prepare_options(self, source, options):
+        # те же значения по умолчанию, что и в get_thumbnail(), иначе
+        # имя миниатюры не совпадёт
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile будущей миниатюры — без чтения исходника."""
+        source = ImageFile(file_)
+        options = self._prepare_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def encodable(options):
+    """Умеет ли Pillow записать формат миниатюры (WebP — не везде)."""
+    Image.init()
+    return options.get('format', 'JPEG') in Image.SAVE
+
+
+def card_variants():
+    """Варианты карточки для srcset: [(формат, [(ширина, размер)])].
+
+    Форматы, которые Pillow не кодирует, пропускаются.
+    """
+    variants = []
+    for format_ in settings.POST_CARD_FORMATS:
+        if not encodable({'format': format_}):
+            continue
+        variants.append((format_, [
+            (width, f'card-{format_.lower()}-{width}')
+            for width in settings.POST_CARD_WIDTHS
+        ]))
+    return variants
+
+
+def card_sizes():
+    """Все размеры, нужные карточке: запасной 'card' и варианты."""
+    return ['card'] + [
+        size for _, widths in card_variants() for _, size in widths
+    ]
+
+
+def generate(name):
+    """Нарезает все размеры POST_THUMBNAILS для картинки name."""
+    # ключи KV sorl включают хранилище исходника — то же, что у поля
+    source = ImageFile(name, post_images)
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        if not encodable(options):
+            continue
+        try:
+            default.backend.get_thumbnail(source, geometry, **options)
+        except Exception:
+            logger.exception(
+                'Не удалось нарезать миниатюру %s для %s', geometry, name
+            )
+    # карточки, отрисованные с исходной картинкой, пора перерисовать
+    post_ids = Post.objects.filter(image=name).values_list('id', flat=True)
+    versions.bump(*(f'card:post:{post_id}' for post_id in post_ids))
+
+
+def generate_in_thread(name):
+    """generate() в потоке пула: поток держит своё соединение с базой."""
+    try:
+        generate(name)
+    finally:
+        _pending.discard(name)
+        connection.close()
+
+
+def submit(name):
+    """Нарезает картинку в пуле; при THUMBNAIL_WORKERS = 0 — сразу."""
+    if not name:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+    elif name not in _pending:
+        _pending.add(name)
+        executor().submit(generate_in_thread, name)
+
+
+def schedule(post):
+    """Ставит нарезку картинки поста в очередь после коммита."""
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: submit(name))
+
+
+def cached_thumbnails(images, sizes=('card',)):
+    """Готовые миниатюры: {(имя картинки, размер): ImageFile}.
+
+    Для хранилища cached_db записи читаются одним get_many из кэша,
+    а промахи — одним запросом к таблице KV; другие хранилища
+    опрашиваются по одной миниатюре.
+    """
+    files = {}
+    for image in images:
+        if not image:
+            continue
+        for size in sizes:
+            geometry, options = settings.POST_THUMBNAILS[size]
+            files[image.name, size] = default.backend.thumbnail_file(
+                image, geometry, **options
+            )
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        found = {item: kvstore.get(file_) for item, file_ in files.items()}
+        return {item: file_ for item, file_ in found.items() if file_}
+    # разные размеры могут дать одну и ту же миниатюру ('card' и
+    # 'card-jpeg-960'), поэтому ключ KV ведёт к списку размеров
+    keys = {}
+    for item, file_ in files.items():
+        keys.setdefault(add_prefix(file_.key), []).append(item)
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        kvstore.cache.set_many(
+            {key: stored.get(key, EMPTY_VALUE) for key in missing},
+            cache_timeout(thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT),
+        )
+        values.update(stored)
+    return {
+        item: deserialize_image_file(value)
+        for key, value in values.items()
+        if value and value != EMPTY_VALUE
+        for item in keys[key]
+    }
+
+
+def card_thumbnails(posts):
+    """Миниатюры карточек постов одним пакетным чтением: {id: {размер: …}}."""
+    sizes = card_sizes()
+    found = cached_thumbnails((post.image for post in posts), sizes)
+    return {
+        post.id: {
+            size: found[post.image.name, size]
+            for size in sizes if (post.image.name, size) in found
+        }
+        for post in posts
+    }
+
+
+def resolve_cards(posts):
+    """Проставляет постам card_thumbnails, чтобы шаблон не ходил в KV."""
+    found = card_thumbnails(posts)
+    for post in posts:
+        post.card_thumbnails = found[post.id]
+
+
+def fill_image_meta(post):
+    """Проставляет посту размеры и заглушку его текущей картинки."""
+    if not post.image:
+        post.image_width = post.image_height = None
+        post.image_placeholder = ''
+        return
+    post.image.open()
+    try:
+        data = post.image.read()
+    finally:
+        post.image.seek(0)
+    post.image_width, post.image_height, post.image_placeholder = (
+        image_meta(data)
+    )
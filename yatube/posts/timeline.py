@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db.models import F
+from posts import metrics
+from posts.models import AuthorStats, Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def pulled_authors(author_ids):
+    """Авторы, чьи посты не раскладываются по лентам, а читаются на лету.
+
+    Автор становится таким, набрав FEED_FANOUT_THRESHOLD подписчиков
+    (mark_pulled), и остаётся им, пока команда unpull_authors не разложит
+    его посты; None в настройке отключает гибридный режим.
+    """
+    if settings.FEED_FANOUT_THRESHOLD is None:
+        return set()
+    return set(
+        AuthorStats.objects.filter(
+            user_id__in=author_ids, pulled=True
+        ).values_list('user_id', flat=True)
+    )
+
+
+def mark_pulled(author_ids):
+    """Переводит авторов, набравших порог подписчиков, в чтение на лету."""
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    if threshold is None:
+        return
+    AuthorStats.objects.filter(
+        user_id__in=author_ids, followers_count__gte=threshold, pulled=False
+    ).update(pulled=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if pulled_authors([post.author_id]):
+        metrics.incr('feed.fanout.skipped')
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    entries = [
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    ]
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    metrics.incr('feed.fanout.posts')
+    metrics.incr('feed.fanout.rows', len(entries))
+
+
+def recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'pub_date')[:settings.FEED_TIMELINE_BACKFILL]
+    )
+
+
+def push(user_id, posts):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if pulled_authors([author_id]):
+        return
+    push(user_id, recent_posts(author_id))
+
+
+def unpull_candidates():
+    """Авторы, которых пора снова раскладывать по лентам.
+
+    Порог возврата ниже порога перехода (FEED_UNPULL_RATIO), чтобы
+    автор на границе не переключался туда и обратно на каждой подписке.
+    """
+    pulled = AuthorStats.objects.filter(pulled=True)
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    if threshold is not None:
+        pulled = pulled.filter(
+            followers_count__lt=threshold * settings.FEED_UNPULL_RATIO
+        )
+    return list(pulled.values_list('user_id', flat=True))
+
+
+def unpull(author_id):
+    """Раскладывает по лентам подписчиков последние посты автора.
+
+    Флаг снимается до раскладки: посты, написанные во время неё, уже
+    расходятся через fan_out, а прежние добавляются здесь.
+    """
+    AuthorStats.objects.filter(user_id=author_id).update(pulled=False)
+    posts = recent_posts(author_id)
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        push(user_id, posts)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты с нуля по текущим подпискам."""
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    edges = follows.values_list('user_id', 'author_id')
+    for user_id, author_id in edges.iterator():
+        backfill(user_id, author_id)
+
+
+def timeline_posts(user):
+    """Посты ленты подписок.
+
+    Ключ пагинации (feed_date, feed_post) берётся из TimelineEntry,
+    поэтому страница читается одним диапазоном индекса ленты.
+    """
+    return Post.objects.select_related('author', 'group').filter(
+        timeline_entries__user=user
+    ).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post_id'),
+    )
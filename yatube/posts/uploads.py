@@ -0,0 +1,130 @@
+"""Приём картинок постов без риска для потоков веб-сервера.
+
+Загрузка пишется во временный файл и обрывается после
+POST_IMAGE_MAX_BYTES (LimitedUploadHandler). Декодирование с лимитом
+пикселей, снятие EXIF и перекодирование идут в отдельном пуле процессов,
+а запрос ждёт результат не дольше POST_IMAGE_TIMEOUT.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from posts.imaging import ImageRejected, sanitize
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Пропускает файлы больше POST_IMAGE_MAX_BYTES, не дочитывая их.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS; имена пропущенных полей
+    запоминаются в request.rejected_uploads для ошибки формы.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            rejected = getattr(self.request, 'rejected_uploads', set())
+            rejected.add(self.field_name)
+            self.request.rejected_uploads = rejected
+            raise SkipFile()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def rejected(request):
+    """Поля формы, файлы которых отброшены из-за размера."""
+    return getattr(request, 'rejected_uploads', set())
+
+
+def executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            # не fork: в процессе уже работают потоки (пул миниатюр,
+            # сервер) и открыты соединения с базой, а fork такого
+            # процесса может оставить ребёнка с захваченной блокировкой
+            methods = multiprocessing.get_all_start_methods()
+            method = 'forkserver' if 'forkserver' in methods else 'spawn'
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.POST_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context(method),
+            )
+            # очередь пула ограничена: лишние запросы получают отказ,
+            # а не копятся за медленными картинками
+            _slots = threading.BoundedSemaphore(
+                settings.POST_IMAGE_WORKERS * 2
+            )
+    return _executor
+
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+
+def process(upload):
+    """Чистая копия загруженной картинки и её метаданные.
+
+    Возвращает (файл, ширина, высота, заглушка); любая неудача —
+    ImageRejected с понятным пользователю текстом.
+    """
+    pool = executor()
+    # слот освобождается, только когда процесс закончил работу, даже
+    # если запрос уже ушёл по таймауту
+    if not _slots.acquire(timeout=settings.POST_IMAGE_TIMEOUT):
+        raise ImageRejected('Сервер занят обработкой картинок, повторите')
+    if isinstance(upload, TemporaryUploadedFile):
+        source = upload.temporary_file_path()
+    else:
+        upload.seek(0)
+        source = upload.read()
+    try:
+        future = pool.submit(
+            sanitize, source,
+            settings.POST_IMAGE_MAX_PIXELS, settings.POST_IMAGE_QUALITY,
+        )
+    except BrokenProcessPool:
+        _slots.release()
+        _reset_executor(pool)
+        raise ImageRejected('Не удалось обработать картинку')
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        data, extension, width, height, placeholder = future.result(
+            timeout=settings.POST_IMAGE_TIMEOUT
+        )
+    except FutureTimeoutError:
+        future.cancel()
+        raise ImageRejected('Картинка обрабатывается слишком долго')
+    except BrokenProcessPool:
+        # процесс убит (например, по памяти) — пул пересоздаётся
+        _reset_executor(pool)
+        raise ImageRejected('Не удалось обработать картинку')
+    except ImageRejected:
+        raise
+    except Exception:
+        raise ImageRejected('Файл не является корректной картинкой')
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    image = SimpleUploadedFile(
+        f'{name}.{extension}', data,
+        content_type='image/png' if extension == 'png' else 'image/jpeg',
+    )
+    return image, width, height, placeholder
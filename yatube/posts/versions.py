@@ -0,0 +1,72 @@
+"""Счётчики версий для ключей кэша.
+
+Запись поднимает версию, и все ключи со старой версией перестают
+читаться сами собой. Версия, вытесненная из кэша, начинается заново
+со значения по времени, а не с 1, чтобы не совпасть со старыми ключами.
+Рядом с версией хранится время последней записи — для Last-Modified.
+"""
+import time
+
+from django.core.cache import cache
+
+PREFIX = 'version:'
+MODIFIED_PREFIX = 'modified:'
+
+
+def _fresh():
+    return int(time.time() * 1000)
+
+
+def get_versions(names):
+    keys = {PREFIX + name: name for name in names}
+    found = cache.get_many(keys)
+    missing = {key: _fresh() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def get_version(name):
+    return get_versions([name])[name]
+
+
+def last_modified(names):
+    """Время последней записи (unix, секунды) по любому из имён.
+
+    Для имён, о которых кэш не помнит, отсчёт начинается с текущего
+    момента — как и у вытесненной версии.
+    """
+    keys = [MODIFIED_PREFIX + name for name in names]
+    found = cache.get_many(keys)
+    missing = dict.fromkeys(
+        (key for key in keys if key not in found), int(time.time())
+    )
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return max(found.values(), default=None)
+
+
+def bump(*names):
+    # не incr: у части бэкендов он перезаписывает ключ с timeout по
+    # умолчанию. Гонка двух bump даёт одну новую версию на обоих, но
+    # читают её уже после обеих записей в базу
+    keys = [PREFIX + name for name in names]
+    found = cache.get_many(keys)
+    values = {
+        key: found[key] + 1 if key in found else _fresh() for key in keys
+    }
+    values.update(dict.fromkeys(
+        (MODIFIED_PREFIX + name for name in names), int(time.time())
+    ))
+    cache.set_many(values, timeout=None)
+
+
+def feed_names(post, group_ids=()):
+    """Версии лент, на которых виден пост."""
+    names = ['feed:index', f'feed:author:{post.author_id}']
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            names.append(f'feed:group:{group_id}')
+    return names
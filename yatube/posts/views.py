@@ -1,77 +1,169 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from posts import counters, follows, graph, thumbnails, uploads
+from posts.feeds import follow_feed
 from posts.forms import CommentForm, PostForm
-from posts.models import Comment, Follow, Group, Post, User
+from posts.models import Comment, Group, Post, User
+from posts.page_cache import (cache_anonymous_page, conditional_page,
+                              post_tags, tag)
+from posts.pagination import (FEED_KEYS, CursorPaginator, KeysetQuerySet,
+                              WindowPaginator)
+from posts.search import SearchFeed, match_query
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# ?order= для комментариев: сначала старые или сначала новые
+COMMENT_ORDERS = {'old': False, 'new': True}
 
 
-def paginator_post(queryset, request):
-    paginator = Paginator(queryset, POSTS_PER_PAGE)
+def paginator_post(queryset, request, keys=FEED_KEYS, count=None):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # ?page=N оставлен для старых ссылок, новые ведут по ?cursor=;
+    # слитые ленты (не queryset) листаются только курсором
+    if hasattr(queryset, 'fetch') or (
+        settings.FEED_PAGINATION == 'cursor' and page_number is None
+    ):
+        paginator = CursorPaginator(queryset, POSTS_PER_PAGE, keys)
+        page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    else:
+        paginator = WindowPaginator(
+            queryset, POSTS_PER_PAGE,
+            exact_count=settings.FEED_EXACT_COUNT, count=count,
+        )
+        page_obj = paginator.get_page(page_number)
+    page_obj.object_list = list(page_obj.object_list)
     return {
         'page_obj': page_obj,
     }
 
 
+@conditional_page
+@cache_anonymous_page
 def index(request):
     posts = Post.objects.select_related(
         'author',
         'group'
     )
-    context = paginator_post(posts, request)
+    context = paginator_post(
+        posts, request,
+        count=lambda: counters.feed_count('feed:index', Post.objects),
+    )
     context.update({'active': 'index'})
+    tag(request, 'feed:index', *post_tags(context['page_obj']))
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page
+@cache_anonymous_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author', 'group')
     context = {
         'group': group,
     }
-    context.update(paginator_post(posts, request))
+    context.update(paginator_post(
+        posts, request,
+        count=lambda: counters.feed_count(f'feed:group:{group.id}', posts),
+    ))
+    tag(request, f'group:{group.slug}', *post_tags(context['page_obj']))
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page
+@cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     profile = author.posts.select_related('author', 'group')
     context = {
         'author': author,
     }
-    context.update(paginator_post(profile, request))
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
-    else:
-        following = False
-    context.update({'following': following})
+
+    def count():
+        # счётчик постов автора поддерживается сигналами и точен; строки
+        # счётчиков нет у пользователей, созданных в обход сигналов
+        if hasattr(author, 'stats'):
+            return author.stats.posts_count
+        return counters.feed_count(f'feed:author:{author.id}', profile)
+
+    context.update(paginator_post(profile, request, count=count))
+    tag(request, f'author:{author.id}', *post_tags(context['page_obj']))
+    context.update({'following': graph.is_following(request.user, author)})
     return render(request, 'posts/profile.html', context)
 
 
+def paginator_comments(request, post_id):
+    order = request.GET.get('order')
+    if order not in COMMENT_ORDERS:
+        order = 'old'
+    source = KeysetQuerySet(
+        Comment.objects.select_related('author').filter(post_id=post_id),
+        ('created', 'id'),
+        descending=COMMENT_ORDERS[order],
+    )
+    paginator = CursorPaginator(source, COMMENTS_PER_PAGE)
+    return {
+        'comments': paginator.get_cursor_page(request.GET.get('cursor')),
+        'comment_order': order,
+    }
+
+
+@conditional_page
+@cache_anonymous_page
 def post_detail(request, post_id):
-    post_detail = get_object_or_404(Post, id=post_id)
-    comments = Comment.objects.select_related(
-        'author',
-        'post'
-    ).filter(post=post_detail.id)
+    post_detail = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    tag(request, f'post:{post_detail.id}', *post_tags([post_detail]))
     form = CommentForm()
     context = {
         'post': post_detail,
         'form': form,
-        'comments': comments,
+        **paginator_comments(request, post_detail.id),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cache_anonymous_page
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    tag(request, f'post:{post_id}')
+    context = {
+        'post_id': post_id,
+        **paginator_comments(request, post_id),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    match = match_query(query)
+    context = {'query': query}
+    if match is not None:
+        paginator = CursorPaginator(SearchFeed(match), POSTS_PER_PAGE)
+        context.update({
+            'page_obj': paginator.get_cursor_page(request.GET.get('cursor')),
+            'page_query': urlencode({'q': query}) + '&',
+        })
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        rejected_uploads=uploads.rejected(request),
+    )
     if not form.is_valid():
         return render(
             request,
@@ -80,7 +172,9 @@ def post_create(request):
         )
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    with transaction.atomic():
+        post.save()
+        thumbnails.schedule(post)
     return redirect('posts:profile', username=request.user)
 
 
@@ -94,10 +188,14 @@ def post_edit(request, post_id):
         request.POST or None,
         files=request.FILES or None,
         instance=post,
+        rejected_uploads=uploads.rejected(request),
     )
 
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -115,31 +213,28 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = get_object_or_404(Post, id=post_id)
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    list_of_posts = Post.objects.filter(author__following__user=request.user)
-    context = paginator_post(list_of_posts, request)
+    context = paginator_post(follow_feed(request.user), request)
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    with transaction.atomic():
+        follows.follow(request.user.id, author.id)
     return redirect(reverse('posts:profile', args=[username]))
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user, author=author)
-    if is_follower.exists():
-        is_follower.delete()
-    return redirect('posts:profile', username=author)
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    with transaction.atomic():
+        follows.unfollow(request.user.id, author.id)
+    return redirect('posts:profile', username=username)
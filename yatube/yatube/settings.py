@@ -1,5 +1,6 @@
 
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -18,6 +19,9 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 DEBUG = True
 
+# Запущены тесты: manage.py test или pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -42,6 +46,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.replicas.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,13 +79,42 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# Профиль SQLite для продакшена (posts.sqlite): прагмы SQLITE_PRAGMAS на
+# каждом соединении и постоянные соединения
+SQLITE_PROFILE = False
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение — в килобайтах: 64 МБ
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60 if SQLITE_PROFILE else 0,
+    },
+    # копия основной базы для чтения; обновляется командой sync_replicas
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'CONN_MAX_AGE': 60 if SQLITE_PROFILE else 0,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['posts.replicas.ReplicaRouter']
+# Базы, с которых читают запросы; пусто — всё читается с основной
+DATABASE_REPLICAS = []
+# Сколько секунд после записи пользователь читает с основной базы
+REPLICA_PIN_SECONDS = 10
+# Насколько реплика может отставать (интервал sync_replicas); столько же
+# живут кэши, заполненные чтением с реплики
+REPLICA_LAG = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -113,10 +147,84 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+# Кэш процесса — для разработки и тестов. Версии, страницы, карточки и
+# подписки живут часами и сбрасываются поднятием версий, поэтому при
+# нескольких воркерах кэш должен быть общим: memcached
+# ('django.core.cache.backends.memcached.PyLibMCCache') или Redis
+# (django-redis). Файловый и БД-кэш не годятся: каждый set перебирает
+# все записи ради вытеснения
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Пагинация лент: 'cursor' (по ключу pub_date, id) или 'offset'
+FEED_PAGINATION = 'cursor'
+# Считать ли записи для ?page=N; False — без COUNT(*), только «Следующая»
+FEED_EXACT_COUNT = True
+# Насколько может устареть число записей ленты для ?page=N, с
+FEED_COUNT_TIMEOUT = 60 * 5
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Лента подписок: 'timeline' (материализованная, с гибридным режимом),
+# 'ring' (кольцевые буферы авторов в кэше) или 'query' (JOIN)
+FOLLOW_FEED_ENGINE = 'timeline'
+# Сколько последних постов автора попадает в ленту при подписке
+FEED_TIMELINE_BACKFILL = 1000
+# Посты авторов с таким числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении; None — раскладывать всех
+FEED_FANOUT_THRESHOLD = 5000
+# Доля порога, ниже которой unpull_authors снова раскладывает автора
+FEED_UNPULL_RATIO = 0.9
+# Сколько последних постов такого автора подмешивается в ленту
+FEED_PULL_CUTOFF = 200
+# Размер и время жизни кольцевого буфера постов автора для 'ring'
+FEED_RING_SIZE = 200
+FEED_RING_TIMEOUT = 60 * 60 * 24
+# Время жизни страниц в кэше для анонимов; сброс идёт по тегам
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Время жизни HTML карточек постов; сброс идёт по версиям поста, автора
+# и группы
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Ширины карточки поста для srcset; каждая режется в каждом формате
+POST_CARD_WIDTHS = (480, 960, 1440)
+# Форматы вариантов карточки в порядке предпочтения для <picture>
+POST_CARD_FORMATS = ('WEBP', 'JPEG')
+# Миниатюры картинок постов: имя -> (геометрия, опции sorl)
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    **{
+        f'card-{card_format.lower()}-{card_width}': (
+            f'{card_width}x{round(card_width * 339 / 960)}',
+            {'crop': 'center', 'upscale': True, 'format': card_format},
+        )
+        for card_format in POST_CARD_FORMATS
+        for card_width in POST_CARD_WIDTHS
+    },
+}
+# Загрузки сразу пишутся во временный файл, а файлы больше
+# POST_IMAGE_MAX_BYTES отбрасываются, не дочитываясь до конца
+FILE_UPLOAD_MAX_MEMORY_SIZE = 0
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+# Лимит пикселей при декодировании: защита от «картинок-бомб»
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# Качество JPEG при перекодировании загрузки
+POST_IMAGE_QUALITY = 85
+# Процессы перекодирования загрузок и сколько запрос ждёт результат, с
+POST_IMAGE_WORKERS = 2
+POST_IMAGE_TIMEOUT = 10
+# Сколько живёт в кэше множество подписок пользователя, с
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+# Позиция gc_media для продолжения прерванного прохода
+MEDIA_GC_STATE = os.path.join(BASE_DIR, '.gc_media.json')
+# Потоки фоновой нарезки миниатюр после загрузки; 0 — нарезать сразу
+# после коммита. В тестах пул не нужен: его задачи переживают тест и
+# пишут в настоящий MEDIA_ROOT и базу после их подмены
+THUMBNAIL_WORKERS = 0 if TESTING else 2
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'